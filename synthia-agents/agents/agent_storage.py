@@ -0,0 +1,32 @@
+# AGENT STORAGE - helpers for uAgents key-value storage shared by the agents
+
+import os
+from typing import List, Optional
+
+from uagents.storage import KeyValueStore
+
+def storage_keys(storage, prefix: str = "") -> List[str]:
+    """Keys starting with prefix (empty when the backend can't list its keys)"""
+    if isinstance(storage, KeyValueStore):
+        return [key for key in storage._data if key.startswith(prefix)]
+    return []
+
+def remove_storage_keys(storage, keys: List[str]) -> int:
+    """Delete keys; a file-backed store is rewritten once instead of once per key"""
+    present = [key for key in keys if storage.has(key)]
+    if isinstance(storage, KeyValueStore):
+        for key in present:
+            del storage._data[key]
+        if present:
+            storage._save()
+    else:
+        for key in present:
+            storage.remove(key)
+    return len(present)
+
+def storage_size(storage) -> Optional[int]:
+    """Bytes on disk for a file-backed store"""
+    path = getattr(storage, "_path", None)
+    if path and os.path.exists(path):
+        return os.path.getsize(path)
+    return None
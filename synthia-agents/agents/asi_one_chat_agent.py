@@ -6,6 +6,8 @@ import os
 import re
 from typing import Optional, Dict, List
 
+from prometheus_client import Counter, Gauge, start_http_server
+from agent_storage import remove_storage_keys, storage_keys, storage_size
 from uagents import Context, Protocol, Agent, Model
 from uagents_core.contrib.protocols.chat import (
     ChatAcknowledgement,
@@ -50,6 +52,22 @@ class BlockchainStatus(Model):
 
 ORCHESTRATOR_ADDRESS = os.getenv("ORCHESTRATOR_ADDRESS", "")
 
+# Expiry of requests whose results never arrive
+CHAT_REQUEST_TTL = float(os.getenv("CHAT_REQUEST_TTL", "3600"))  # seconds since the request
+STORAGE_SWEEP_INTERVAL = float(os.getenv("STORAGE_SWEEP_INTERVAL", "300"))
+
+# Prometheus metrics endpoint (0 disables)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+CHAT_METRICS_PORT = int(os.getenv("CHAT_METRICS_PORT", "9011"))
+
+# ============================================
+# METRICS
+# ============================================
+
+STORAGE_BYTES = Gauge('synthia_chat_storage_bytes', 'Size of the agent storage file')
+STORAGE_KEYS = Gauge('synthia_chat_storage_keys', 'Keys in agent storage')
+EXPIRED = Counter('synthia_chat_expired_requests_total', 'Requests dropped after CHAT_REQUEST_TTL')
+
 # ============================================
 # HELPERS
 # ============================================
@@ -59,6 +77,11 @@ def extract_wallet(text: str) -> Optional[str]:
     matches = re.findall(pattern, text)
     return matches[0] if matches else None
 
+REQUEST_KEY_SUFFIXES = ("_sender", "_wallet", "_time")
+
+def request_keys(request_id: str) -> List[str]:
+    return [f"req_{request_id}{suffix}" for suffix in REQUEST_KEY_SUFFIXES]
+
 def format_score_emoji(score: int) -> tuple:
     if score >= 90:
         return "🌟", "Exceptional"
@@ -312,12 +335,39 @@ _Powered by ASI Alliance 🤖 | Hedera ⛓️_"""
     await send_chat_response(ctx, original_sender, response_text, end_session=True)
     
     # Cleanup
-    ctx.storage.set(f"req_{msg.request_id}_sender", None)
-    ctx.storage.set(f"req_{msg.request_id}_wallet", None)
-    ctx.storage.set(f"req_{msg.request_id}_time", None)
+    remove_storage_keys(ctx.storage, request_keys(msg.request_id))
     
     ctx.logger.info("✅ PHASE 2 sent, session ended")
 
+# ============================================
+# STORAGE SWEEP
+# ============================================
+
+@agent.on_interval(period=STORAGE_SWEEP_INTERVAL)
+async def sweep_storage(ctx: Context):
+    """Expire requests whose blockchain phase never reported back"""
+    
+    cutoff = datetime.now().timestamp() - CHAT_REQUEST_TTL
+    stale = []
+    expired = 0
+    for key in storage_keys(ctx.storage, "req_"):
+        value = ctx.storage.get(key)
+        if value is None:
+            stale.append(key)  # left behind by the old set-to-None cleanup
+        elif key.endswith("_time") and datetime.fromisoformat(value).timestamp() < cutoff:
+            stale.extend(request_keys(key[len("req_"):-len("_time")]))
+            expired += 1
+    
+    remove_storage_keys(ctx.storage, stale)
+    EXPIRED.inc(expired)
+    if stale:
+        ctx.logger.info(f"🧹 Removed {len(stale)} storage keys ({expired} expired requests)")
+    
+    STORAGE_KEYS.set(len(storage_keys(ctx.storage)))
+    size = storage_size(ctx.storage)
+    if size is not None:
+        STORAGE_BYTES.set(size)
+
 # ============================================
 # STARTUP
 # ============================================
@@ -329,6 +379,12 @@ async def startup(ctx: Context):
     ctx.logger.info("=" * 50)
     ctx.logger.info(f"Address: {ctx.agent.address}")
     ctx.logger.info(f"Orch: {ORCHESTRATOR_ADDRESS[:20] if ORCHESTRATOR_ADDRESS else '❌'}...")
+    if CHAT_METRICS_PORT:
+        try:
+            start_http_server(CHAT_METRICS_PORT, addr=METRICS_HOST)
+            ctx.logger.info(f"Metrics: http://{METRICS_HOST}:{CHAT_METRICS_PORT}/metrics")
+        except OSError as e:
+            ctx.logger.error(f"❌ Metrics server failed: {str(e)}")
     ctx.logger.info("=" * 50)
 
 # ============================================
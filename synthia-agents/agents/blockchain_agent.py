@@ -4,9 +4,13 @@ from uagents import Agent, Context, Protocol, Model
 from typing import Optional, List
 import os
 import json
+import requests
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from web3 import Web3
+from web3.providers import JSONBaseProvider
 from eth_account import Account
 import time
+from rpc_endpoints import NON_HEDGED_METHODS, EndpointHealth, endpoint_stats, rank_endpoints
 
 # ============================================
 # MESSAGE MODELS
@@ -37,6 +41,8 @@ ORCHESTRATOR_ADDRESS = os.getenv("ORCHESTRATOR_ADDRESS", "")
 SYNTHIA_CONTRACT_ADDRESS = os.getenv("SYNTHIA_CONTRACT_ADDRESS", "")
 BLOCKCHAIN_EVM_PRIVATE_KEY = os.getenv("BLOCKCHAIN_EVM_PRIVATE_KEY", "")
 RPC_URL = os.getenv("RPC_URL", "https://testnet.hashio.io/api")
+RPC_URLS = [url.strip() for url in os.getenv("RPC_URLS", RPC_URL).split(",") if url.strip()]
+RPC_TIMEOUT_SECONDS = float(os.getenv("RPC_TIMEOUT_SECONDS", "30"))
 HCS_AUDIT_TOPIC_ID = os.getenv("HCS_AUDIT_TOPIC_ID", "")
 
 agent = Agent(
@@ -46,11 +52,87 @@ agent = Agent(
     endpoint=["http://localhost:8003/submit"]
 )
 
+# ============================================
+# RPC POOL
+# ============================================
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """Web3 provider over several endpoints: latency-aware routing, hedging, failover
+    
+    Reads are raced against the next-best endpoint when the first hasn't
+    answered within its hedge delay; failures fail over immediately, and
+    endpoints that keep failing are ejected for RPC_EJECT_SECONDS.
+    """
+    
+    def __init__(self, urls: List[str], **kwargs):
+        super().__init__(**kwargs)
+        self.endpoints = [EndpointHealth(url, RPC_TIMEOUT_SECONDS) for url in urls]
+        self.session = requests.Session()
+        self.executor = ThreadPoolExecutor(max_workers=max(4, 2 * len(urls)))
+        self.hedged = 0
+    
+    def post(self, endpoint: EndpointHealth, body: bytes) -> bytes:
+        started = time.perf_counter()
+        try:
+            response = self.session.post(
+                endpoint.url, data=body, timeout=RPC_TIMEOUT_SECONDS,
+                headers={'Content-Type': 'application/json'}
+            )
+            if response.status_code == 429 or response.status_code >= 500:
+                response.raise_for_status()
+        except Exception:
+            endpoint.record_failure()
+            raise
+        endpoint.record_success(time.perf_counter() - started)
+        return response.content
+    
+    def request(self, body: bytes, hedge: bool = True) -> bytes:
+        candidates = rank_endpoints(self.endpoints)
+        pending = set()
+        next_index = 0
+        last_error: Optional[BaseException] = None
+        
+        def launch():
+            nonlocal next_index
+            pending.add(self.executor.submit(self.post, candidates[next_index], body))
+            next_index += 1
+        
+        launch()
+        while pending:
+            can_hedge = hedge and next_index < len(candidates)
+            timeout = candidates[next_index - 1].hedge_delay() if can_hedge else None
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            
+            if not done:
+                self.hedged += 1
+                launch()
+                continue
+            
+            for future in done:
+                if future.exception() is None:
+                    return future.result()  # slower futures finish in the background
+                last_error = future.exception()
+            
+            if next_index < len(candidates):
+                launch()  # fail over now, even while slower attempts are still pending
+        raise last_error
+    
+    def make_request(self, method, params):
+        raw = self.request(
+            self.encode_rpc_request(method, params),
+            hedge=method not in NON_HEDGED_METHODS
+        )
+        return self.decode_rpc_response(raw)
+    
+    def stats(self) -> dict:
+        return endpoint_stats(self.endpoints)
+
 # ============================================
 # WEB3 SETUP
 # ============================================
 
-w3 = Web3(Web3.HTTPProvider(RPC_URL))
+rpc_provider = PooledHTTPProvider(RPC_URLS)
+w3 = Web3(rpc_provider)
 
 # Load EVM account
 if BLOCKCHAIN_EVM_PRIVATE_KEY:
@@ -330,7 +412,8 @@ async def health_check(ctx: Context):
     
     ctx.logger.info(f"""
 {status} Blockchain Agent Health:
-   RPC: {connected}
+   RPC: {connected} (hedged {rpc_provider.hedged})
+   RPC Pool: {rpc_provider.stats()}
    Account: {evm_account.address if has_account else 'NOT SET'}
    Contract: {SYNTHIA_CONTRACT_ADDRESS if has_contract else 'NOT SET'}
     """)
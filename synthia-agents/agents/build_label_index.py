@@ -0,0 +1,36 @@
+# ADDRESS LABEL INDEX BUILDER
+#
+# Builds the memory-mapped label index read by the wallet analyzer
+# (ADDRESS_LABELS_PATH) from a CSV with "address,label" rows, where label
+# is one of: defi, cex, bridge, mixer, scam.
+#
+#   python build_label_index.py labels.csv address_labels.idx
+
+import argparse
+import csv
+import sys
+
+from wallet_analyzer import AddressLabelIndex, LABEL_NAMES
+
+def read_pairs(path: str):
+    """Yield (address, label id) pairs from the CSV"""
+    label_ids = {name: i for i, name in enumerate(LABEL_NAMES)}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            label = row['label'].strip().lower()
+            if label not in label_ids:
+                print(f"⚠️ Skipping unknown label '{label}' for {row['address']}", file=sys.stderr)
+                continue
+            yield row['address'].strip(), label_ids[label]
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the analyzer's address label index")
+    parser.add_argument("csv_path", help="CSV with address,label columns")
+    parser.add_argument("index_path", help="Output index file")
+    args = parser.parse_args()
+    
+    count = AddressLabelIndex.build(read_pairs(args.csv_path), args.index_path)
+    print(f"✅ Wrote {count} labels to {args.index_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# WALLET ANALYZER FLEET LAUNCHER
+#
+# Starts N wallet analyzer processes on this host, each with its own agent
+# seed, uAgents port and metrics port, and prints the analyzer addresses to
+# put in the orchestrator's WALLET_ANALYZER_ADDRESSES.
+#
+#   python launch_analyzers.py --count 4 --base-port 8001 --metrics-base-port 9001
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from uagents.crypto import Identity
+
+DEFAULT_SEED = "uOYftGLet3q_Ab0ggA6OGbnqZr3feV9wuMD4xBkvoLk"
+
+def shard_seed(base_seed: str, index: int) -> str:
+    """Shard 0 keeps the base seed so a single analyzer keeps its address"""
+    return base_seed if index == 0 else f"{base_seed}-shard-{index}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Start a fleet of wallet analyzer processes")
+    parser.add_argument("--count", type=int, default=os.cpu_count() or 1, help="Number of analyzer processes")
+    parser.add_argument("--base-port", type=int, default=8001, help="uAgents port of the first analyzer")
+    parser.add_argument("--metrics-base-port", type=int, default=9001, help="Metrics port of the first analyzer (0 disables)")
+    parser.add_argument("--host", default="localhost", help="Host used in the advertised endpoints")
+    parser.add_argument("--seed", default=os.getenv("ANALYZER_SEED") or DEFAULT_SEED, help="Base agent seed")
+    args = parser.parse_args()
+    
+    agents_dir = os.path.dirname(os.path.abspath(__file__))
+    processes = []
+    addresses = []
+    
+    for index in range(args.count):
+        seed = shard_seed(args.seed, index)
+        port = args.base_port + index
+        env = dict(
+            os.environ,
+            ANALYZER_SEED=seed,
+            ANALYZER_PORT=str(port),
+            ANALYZER_ENDPOINT=f"http://{args.host}:{port}/submit",
+            METRICS_PORT=str(args.metrics_base_port + index if args.metrics_base_port else 0)
+        )
+        processes.append(subprocess.Popen(
+            [sys.executable, "-c", "from wallet_analyzer import agent; agent.run()"],
+            cwd=agents_dir,
+            env=env
+        ))
+        addresses.append(Identity.from_seed(seed, 0).address)
+        print(f"🚀 Analyzer {index}: port {port}, pid {processes[-1].pid}, {addresses[-1]}")
+    
+    print(f"\nWALLET_ANALYZER_ADDRESSES={','.join(addresses)}\n")
+    
+    def stop(signum=None, frame=None):
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            process.wait()
+        sys.exit(0)
+    
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while True:
+            for index, process in enumerate(processes):
+                if process.poll() is not None:
+                    print(f"❌ Analyzer {index} exited with code {process.returncode}", file=sys.stderr)
+                    stop()
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop()
+
+if __name__ == "__main__":
+    main()
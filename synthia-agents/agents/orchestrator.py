@@ -1,9 +1,21 @@
 # ORCHESTRATOR - WORKING STORAGE (Synchronous)
 
 from uagents import Context, Protocol, Agent, Model
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
+from collections import OrderedDict, deque
 import time
 import os
+import asyncio
+import bisect
+import hashlib
+import heapq
+import itertools
+import json
+import sqlite3
+import threading
+from web3 import AsyncWeb3, Web3
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from agent_storage import remove_storage_keys, storage_keys, storage_size
 
 # ============================================
 # MESSAGE MODELS
@@ -67,6 +79,25 @@ class BlockchainStatus(Model):
     tx_hash: Optional[str] = None
     error: Optional[str] = None
 
+class BatchScoreAnalysis(Model):
+    request_id: str
+    analyzer_id: str
+    results: List[ScoreAnalysis]
+    timestamp: int
+
+class PrescoreRequest(Model):
+    wallet_addresses: List[str]
+    request_id: str
+    requester: Optional[str] = None
+
+class AnalyzerPing(Model):
+    timestamp: int
+
+class AnalyzerStatus(Model):
+    analyzer_id: str
+    active_analyses: int
+    timestamp: int
+
 # ============================================
 # CONFIGURATION
 # ============================================
@@ -75,6 +106,52 @@ ASI_ONE_CHAT = os.getenv("ASI_ONE_CHAT_ADDRESS", "")
 WALLET_ANALYZER = os.getenv("WALLET_ANALYZER_ADDRESS", "")
 BLOCKCHAIN = os.getenv("BLOCKCHAIN_ADDRESS", "")
 
+# Analyzer shards (comma-separated; wallets are consistently hashed across them)
+WALLET_ANALYZERS = [
+    address.strip()
+    for address in (os.getenv("WALLET_ANALYZER_ADDRESSES") or WALLET_ANALYZER).split(",")
+    if address.strip()
+]
+ANALYZER_RING_REPLICAS = int(os.getenv("ANALYZER_RING_REPLICAS", "64"))  # virtual nodes per analyzer
+ANALYZER_HEALTH_INTERVAL = float(os.getenv("ANALYZER_HEALTH_INTERVAL", "15"))
+ANALYZER_HEALTH_TIMEOUT = float(os.getenv("ANALYZER_HEALTH_TIMEOUT", "45"))
+
+# Hedged analysis: past this latency percentile, also ask the next analyzer on the ring (0 disables)
+ANALYZER_HEDGE_PERCENTILE = float(os.getenv("ANALYZER_HEDGE_PERCENTILE", "0"))
+ANALYZER_HEDGE_MIN_DELAY = float(os.getenv("ANALYZER_HEDGE_MIN_DELAY", "1.0"))
+ANALYZER_HEDGE_DEFAULT_DELAY = float(os.getenv("ANALYZER_HEDGE_DEFAULT_DELAY", "8.0"))  # until enough samples
+ANALYZER_HEDGE_MIN_SAMPLES = int(os.getenv("ANALYZER_HEDGE_MIN_SAMPLES", "20"))
+ANALYZER_LATENCY_WINDOW = int(os.getenv("ANALYZER_LATENCY_WINDOW", "500"))  # recent analyses kept
+
+# Background pre-scoring of wallets that requested a score on-chain
+SYNTHIA_CONTRACT_ADDRESS = os.getenv("SYNTHIA_CONTRACT_ADDRESS", "")
+HEDERA_RPC_URL = os.getenv("HEDERA_RPC_URL") or os.getenv("RPC_URL") or "https://testnet.hashio.io/api"
+PRESCORE_POLL_INTERVAL = float(os.getenv("PRESCORE_POLL_INTERVAL", "30"))
+PRESCORE_BLOCK_RANGE = int(os.getenv("PRESCORE_BLOCK_RANGE", "1000"))  # blocks per eth_getLogs call
+PRESCORE_MAX_RANGES = int(os.getenv("PRESCORE_MAX_RANGES", "10"))  # getLogs calls per poll
+PRESCORE_START_BLOCK = int(os.getenv("PRESCORE_START_BLOCK", "0"))  # 0 = start at the chain head
+
+# In-flight requests live in memory and are written behind to SQLite
+ORCHESTRATOR_DB_PATH = os.getenv("ORCHESTRATOR_DB_PATH", "orchestrator_requests.db")
+REQUEST_FLUSH_INTERVAL = float(os.getenv("REQUEST_FLUSH_INTERVAL", "1.0"))  # seconds between batched writes
+
+# Expiry of requests that never finish, and storage compaction
+REQUEST_TTL = float(os.getenv("REQUEST_TTL", "3600"))  # seconds since the last status change
+STORAGE_SWEEP_INTERVAL = float(os.getenv("STORAGE_SWEEP_INTERVAL", "300"))
+STORAGE_VACUUM_RATIO = float(os.getenv("STORAGE_VACUUM_RATIO", "0.25"))  # free-page share that triggers VACUUM
+
+# Stage deadlines: re-dispatch requests whose analyzer or blockchain reply never arrives
+ANALYSIS_STAGE_TIMEOUT = float(os.getenv("ANALYSIS_STAGE_TIMEOUT", "30"))
+BLOCKCHAIN_STAGE_TIMEOUT = float(os.getenv("BLOCKCHAIN_STAGE_TIMEOUT", "180"))
+STAGE_MAX_RETRIES = int(os.getenv("STAGE_MAX_RETRIES", "2"))  # re-dispatches before failing the request
+STAGE_RETRY_BACKOFF = float(os.getenv("STAGE_RETRY_BACKOFF", "2"))  # first delay; doubles per retry
+STAGE_RETRY_BACKOFF_MAX = float(os.getenv("STAGE_RETRY_BACKOFF_MAX", "60"))
+DEADLINE_CHECK_INTERVAL = float(os.getenv("DEADLINE_CHECK_INTERVAL", "1.0"))
+
+# Prometheus metrics endpoint (0 disables)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+ORCHESTRATOR_METRICS_PORT = int(os.getenv("ORCHESTRATOR_METRICS_PORT", "9010"))
+
 # ============================================
 # AGENT
 # ============================================
@@ -85,31 +162,496 @@ agent = Agent(
 )
 
 # ============================================
-# STORAGE HELPERS (Synchronous)
+# ANALYZER SHARDS
 # ============================================
 
-def store_request(ctx: Context, request_id: str, data: dict):
-    """Store request using context storage"""
-    key = f"req_{request_id}"
-    ctx.storage.set(key, data)
-    ctx.logger.info(f"✅ Stored: {key}")
-
-def get_request(ctx: Context, request_id: str) -> Optional[dict]:
-    """Get request from context storage"""
-    key = f"req_{request_id}"
-    data = ctx.storage.get(key)
-    if data:
-        ctx.logger.info(f"✅ Found: {key}")
-    else:
-        ctx.logger.error(f"❌ Not found: {key}")
-    return data
+class AnalyzerRing:
+    """Consistent-hash ring of analyzer addresses
+    
+    Each wallet maps to the first healthy analyzer clockwise from its hash,
+    so a wallet keeps hitting the same analyzer (and its warm caches), and
+    when an analyzer stops answering health checks only its wallets move.
+    """
+    
+    def __init__(self, addresses: List[str], replicas: int = ANALYZER_RING_REPLICAS):
+        self.addresses = list(dict.fromkeys(addresses))
+        points = sorted(
+            (self.hash_key(f"{address}#{replica}"), address)
+            for address in self.addresses
+            for replica in range(replicas)
+        )
+        self.point_hashes = [point for point, _ in points]
+        self.point_addresses = [address for _, address in points]
+        
+        # Every analyzer starts healthy until it misses health checks
+        now = time.time()
+        self.last_seen: Dict[str, float] = {address: now for address in self.addresses}
+        self.active_analyses: Dict[str, int] = {address: 0 for address in self.addresses}
+    
+    @staticmethod
+    def hash_key(key: str) -> int:
+        return int.from_bytes(hashlib.sha1(key.encode()).digest()[:8], 'big')
+    
+    def mark_seen(self, address: str, active_analyses: Optional[int] = None):
+        if address in self.last_seen:
+            self.last_seen[address] = time.time()
+            if active_analyses is not None:
+                self.active_analyses[address] = active_analyses
+    
+    def is_healthy(self, address: str, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return now - self.last_seen[address] <= ANALYZER_HEALTH_TIMEOUT
+    
+    def healthy(self) -> List[str]:
+        now = time.time()
+        return [address for address in self.addresses if self.is_healthy(address, now)]
+    
+    def pick(self, wallet_address: str) -> Optional[str]:
+        """Analyzer owning this wallet (falls back to the primary owner if none are healthy)"""
+        if not self.point_hashes:
+            return None
+        
+        now = time.time()
+        start = bisect.bisect(self.point_hashes, self.hash_key(wallet_address.lower()))
+        size = len(self.point_hashes)
+        for offset in range(size):
+            address = self.point_addresses[(start + offset) % size]
+            if self.is_healthy(address, now):
+                return address
+        return self.point_addresses[start % size]
+    
+    def pick_alternate(self, wallet_address: str, exclude: str) -> Optional[str]:
+        """Next healthy analyzer clockwise that isn't `exclude` (the hedge target)"""
+        if not self.point_hashes:
+            return None
+        
+        now = time.time()
+        start = bisect.bisect(self.point_hashes, self.hash_key(wallet_address.lower()))
+        size = len(self.point_hashes)
+        for offset in range(size):
+            address = self.point_addresses[(start + offset) % size]
+            if address != exclude and self.is_healthy(address, now):
+                return address
+        return None
+    
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            address[:20]: {
+                'healthy': self.is_healthy(address, now),
+                'active': self.active_analyses[address],
+                'last_seen_s': round(now - self.last_seen[address], 1)
+            }
+            for address in self.addresses
+        }
+
+analyzer_ring = AnalyzerRing(WALLET_ANALYZERS)
+healthy_analyzers = set(analyzer_ring.addresses)
+
+# ============================================
+# HEDGED ANALYSIS
+# ============================================
+
+class LatencyWindow:
+    """Recent analysis latencies, kept sorted for percentile lookups"""
+    
+    def __init__(self, size: int = ANALYZER_LATENCY_WINDOW):
+        self._recent = deque(maxlen=size)
+        self._sorted: List[float] = []
+    
+    def __len__(self) -> int:
+        return len(self._recent)
+    
+    def add(self, seconds: float):
+        if len(self._recent) == self._recent.maxlen:
+            del self._sorted[bisect.bisect_left(self._sorted, self._recent[0])]
+        self._recent.append(seconds)
+        bisect.insort(self._sorted, seconds)
+    
+    def percentile(self, percentile: float) -> float:
+        index = min(len(self._sorted) - 1, int(len(self._sorted) * percentile / 100))
+        return self._sorted[index]
+
+analysis_latency = LatencyWindow()
+
+def hedge_delay() -> float:
+    """How long to wait for the first analyzer before asking a second one"""
+    if len(analysis_latency) < ANALYZER_HEDGE_MIN_SAMPLES:
+        return ANALYZER_HEDGE_DEFAULT_DELAY
+    return max(ANALYZER_HEDGE_MIN_DELAY, analysis_latency.percentile(ANALYZER_HEDGE_PERCENTILE))
+
+# ============================================
+# ON-CHAIN SCORE REQUESTS
+# ============================================
+
+SCORE_REQUESTED_TOPIC = Web3.to_hex(Web3.keccak(text="ScoreRequested(address,uint256,bytes32)"))
+A2A_REQUEST_TOPIC = Web3.to_hex(Web3.keccak(text="A2ARequestReceived(address,address,uint256,bytes32)"))
+
+# Position of the indexed `user` topic in each event
+USER_TOPIC_INDEX = {SCORE_REQUESTED_TOPIC: 1, A2A_REQUEST_TOPIC: 2}
+
+PRESCORE_CURSOR_KEY = "prescore_next_block"
+
+hedera_w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(HEDERA_RPC_URL)) if SYNTHIA_CONTRACT_ADDRESS else None
+
+def wallet_from_log(log) -> Optional[str]:
+    """Requested wallet of a ScoreRequested / A2ARequestReceived log"""
+    topics = log["topics"]
+    index = USER_TOPIC_INDEX.get(Web3.to_hex(topics[0])) if topics else None
+    if index is None or len(topics) <= index:
+        return None
+    return Web3.to_checksum_address(bytes(topics[index])[-20:])
+
+async def fetch_requested_wallets(from_block: int, to_block: int) -> List[str]:
+    """Wallets that requested a score in [from_block, to_block]"""
+    logs = await hedera_w3.eth.get_logs({
+        "address": Web3.to_checksum_address(SYNTHIA_CONTRACT_ADDRESS),
+        "fromBlock": from_block,
+        "toBlock": to_block,
+        "topics": [[SCORE_REQUESTED_TOPIC, A2A_REQUEST_TOPIC]]
+    })
+    wallets = (wallet_from_log(log) for log in logs)
+    return [wallet for wallet in wallets if wallet]
+
+# ============================================
+# METRICS
+# ============================================
+
+STORAGE_BYTES = Gauge('synthia_orchestrator_storage_bytes', 'Bytes on disk per store', ['store'])
+EXPIRED = Counter('synthia_orchestrator_expired_requests_total', 'Requests dropped after REQUEST_TTL', ['status'])
+TRACKED = Gauge('synthia_orchestrator_requests', 'Requests held in memory')
+STAGE_TIMEOUTS = Counter('synthia_orchestrator_stage_timeouts_total', 'Stages that missed their deadline', ['stage'])
+STAGE_RETRIES = Counter('synthia_orchestrator_stage_retries_total', 'Stage re-dispatches after a timeout', ['stage'])
+DEDUPLICATED = Counter('synthia_orchestrator_deduplicated_requests_total', 'Requests attached to an in-flight request for the same wallet')
+ANALYSIS_DISPATCHES = Counter('synthia_orchestrator_analysis_dispatches_total', 'Requests sent to an analyzer')
+ANALYSIS_HEDGES = Counter('synthia_orchestrator_analysis_hedges_total', 'Analyses also sent to a second analyzer')
+HEDGE_WINS = Counter('synthia_orchestrator_analysis_hedge_wins_total', 'Hedged analyses answered first by the second analyzer')
+ANALYSIS_LATENCY = Histogram(
+    'synthia_orchestrator_analysis_seconds', 'Dispatch to first accepted analysis',
+    buckets=(0.5, 1, 2, 4, 8, 12, 20, 30, 60)
+)
+HEDGE_SAVED = Histogram(
+    'synthia_orchestrator_hedge_saved_seconds', 'How much earlier a winning hedge answered than the original analyzer',
+    buckets=(0.1, 0.5, 1, 2, 4, 8, 15, 30)
+)
+STAGE_FAILURES = Counter('synthia_orchestrator_stage_failures_total', 'Requests failed after exhausting retries', ['stage'])
 
-def delete_request(ctx: Context, request_id: str):
-    """Delete request from storage"""
-    key = f"req_{request_id}"
-    if ctx.storage.get(key):
-        ctx.storage.set(key, None)  # Delete by setting to None
-        ctx.logger.info(f"✅ Deleted: {key}")
+# ============================================
+# REQUEST TABLE
+# ============================================
+
+class InvalidTransition(ValueError):
+    """Raised when a request is moved to a status its lifecycle doesn't allow"""
+
+class RequestTable:
+    """In-memory request state with write-behind persistence to SQLite
+    
+    Every status change happens in memory; changed rows are marked dirty and
+    written in one batched transaction per flush, so a request costs a
+    handful of dict updates instead of a storage-file rewrite per step. A
+    request created and finished between two flushes never touches disk.
+    Rows that were flushed are reloaded on restart.
+    
+    Requests for a wallet that is already in flight don't get a row of
+    their own: they are listed as subscribers on the in-flight request and
+    receive its results.
+    """
+    
+    TRANSITIONS = {
+        None: {"analyzing", "blockchain_pending"},  # pre-scores start at the blockchain step
+        "analyzing": {"analysis_complete", "failed"},
+        "analysis_complete": {"blockchain_pending", "failed"},
+        "blockchain_pending": {"completed", "failed"},
+        "completed": set(),
+        "failed": set(),
+    }
+    IN_FLIGHT = {"analyzing", "analysis_complete", "blockchain_pending"}
+    
+    def __init__(self, path: str = ORCHESTRATOR_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._requests: Dict[str, dict] = {}
+        self._by_wallet: Dict[str, str] = {}  # wallet -> in-flight request id
+        self._by_subscriber: Dict[str, str] = {}  # subscriber request id -> request id
+        self._dirty = set()
+        self.flushes = 0
+        self.rows_written = 0
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Open the database on first use"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS requests (
+                    request_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    data TEXT NOT NULL
+                )
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+    
+    def __len__(self) -> int:
+        return len(self._requests)
+    
+    def ids(self) -> List[str]:
+        return list(self._requests)
+    
+    def get(self, request_id: str) -> Optional[dict]:
+        return self._requests.get(request_id)
+    
+    def is_tracked(self, request_id: str) -> bool:
+        """Known either as a request or as a subscriber of one"""
+        return request_id in self._requests or request_id in self._by_subscriber
+    
+    def find_in_flight(self, wallet_address: str) -> Optional[dict]:
+        """The chat-facing request currently scoring this wallet, if any"""
+        request_id = self._by_wallet.get(wallet_address.lower())
+        return self._requests.get(request_id) if request_id else None
+    
+    def create(self, data: dict) -> dict:
+        """Add a new request in its first status"""
+        self._check(None, data["status"])
+        data["updated_at"] = time.time()
+        data.setdefault("subscribers", [])
+        self._requests[data["request_id"]] = data
+        self._index(data)
+        self._dirty.add(data["request_id"])
+        return data
+    
+    def subscribe(self, request_id: str, subscriber: dict) -> dict:
+        """Attach another requester's request to an in-flight request"""
+        data = self._requests[request_id]
+        data["subscribers"].append(subscriber)
+        self._by_subscriber[subscriber["request_id"]] = request_id
+        self._dirty.add(request_id)
+        return data
+    
+    def _index(self, data: dict):
+        if not data.get("background") and data["status"] in self.IN_FLIGHT:
+            self._by_wallet[data["wallet_address"].lower()] = data["request_id"]
+        for subscriber in data.get("subscribers", ()):
+            self._by_subscriber[subscriber["request_id"]] = data["request_id"]
+    
+    def _unindex_wallet(self, data: dict):
+        wallet = data["wallet_address"].lower()
+        if self._by_wallet.get(wallet) == data["request_id"]:
+            del self._by_wallet[wallet]
+    
+    def transition(self, request_id: str, status: str, **fields) -> dict:
+        """Move a request to its next status, updating any extra fields"""
+        data = self._requests[request_id]
+        self._check(data["status"], status)
+        data.update(fields)
+        data["status"] = status
+        data["updated_at"] = time.time()
+        if status not in self.IN_FLIGHT:
+            self._unindex_wallet(data)
+        self._dirty.add(request_id)
+        return data
+    
+    def update(self, request_id: str, **fields) -> dict:
+        """Change fields without moving the request to another status"""
+        data = self._requests[request_id]
+        data.update(fields)
+        data["updated_at"] = time.time()
+        self._dirty.add(request_id)
+        return data
+    
+    def delete(self, request_id: str):
+        data = self._requests.pop(request_id, None)
+        if data is not None:
+            self._unindex_wallet(data)
+            for subscriber in data.get("subscribers", ()):
+                self._by_subscriber.pop(subscriber["request_id"], None)
+            self._dirty.add(request_id)
+    
+    def _check(self, current: Optional[str], status: str):
+        if status not in self.TRANSITIONS.get(current, ()):
+            raise InvalidTransition(f"{current} -> {status}")
+    
+    def counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for data in self._requests.values():
+            counts[data["status"]] = counts.get(data["status"], 0) + 1
+        return counts
+    
+    # ---------- persistence ----------
+    
+    def take_dirty(self) -> Tuple[list, list]:
+        """Snapshot pending writes as (upserts, deletes) and clear the dirty set"""
+        upserts, deletes = [], []
+        for request_id in self._dirty:
+            data = self._requests.get(request_id)
+            if data is None:
+                deletes.append((request_id,))
+            else:
+                upserts.append((request_id, data["status"], data["updated_at"], json.dumps(data)))
+        self._dirty.clear()
+        return upserts, deletes
+    
+    def requeue(self, upserts: list, deletes: list):
+        """Mark a failed snapshot's rows dirty again so the next flush retries them"""
+        self._dirty.update(row[0] for row in upserts)
+        self._dirty.update(row[0] for row in deletes)
+    
+    def write(self, upserts: list, deletes: list):
+        """Apply one snapshot in a single transaction"""
+        with self._lock:
+            conn = self.conn
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO requests (request_id, status, updated_at, data) VALUES (?, ?, ?, ?)",
+                    upserts
+                )
+                conn.executemany("DELETE FROM requests WHERE request_id = ?", deletes)
+        self.flushes += 1
+        self.rows_written += len(upserts) + len(deletes)
+    
+    def flush(self) -> int:
+        """Write pending changes synchronously (startup and shutdown)"""
+        upserts, deletes = self.take_dirty()
+        if upserts or deletes:
+            self.write(upserts, deletes)
+        return len(upserts) + len(deletes)
+    
+    def load(self) -> int:
+        """Restore the requests persisted before a restart"""
+        with self._lock:
+            rows = self.conn.execute("SELECT data FROM requests").fetchall()
+        for (raw,) in rows:
+            data = json.loads(raw)
+            data.setdefault("subscribers", [])
+            self._requests[data["request_id"]] = data
+            self._index(data)
+        return len(rows)
+    
+    def expire(self, max_age: float) -> List[dict]:
+        """Drop requests with no status change for max_age seconds"""
+        cutoff = time.time() - max_age
+        expired = [data for data in self._requests.values() if data["updated_at"] < cutoff]
+        for data in expired:
+            self.delete(data["request_id"])
+        return expired
+    
+    def compact(self, vacuum_ratio: float = STORAGE_VACUUM_RATIO) -> bool:
+        """Fold the WAL back into the database; VACUUM once enough pages are free"""
+        with self._lock:
+            conn = self.conn
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            pages = conn.execute("PRAGMA page_count").fetchone()[0]
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if pages and free / pages >= vacuum_ratio:
+                conn.execute("VACUUM")
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")  # VACUUM goes through the WAL too
+                return True
+        return False
+    
+    def size_bytes(self) -> int:
+        """Database plus WAL size on disk"""
+        return sum(
+            os.path.getsize(self.path + suffix)
+            for suffix in ("", "-wal")
+            if os.path.exists(self.path + suffix)
+        )
+    
+    def close(self):
+        self.flush()
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+    
+    def stats(self) -> dict:
+        return {
+            'requests': len(self._requests),
+            'subscribers': len(self._by_subscriber),
+            'pending_writes': len(self._dirty),
+            'flushes': self.flushes,
+            'rows_written': self.rows_written
+        }
+
+request_table = RequestTable()
+TRACKED.set_function(lambda: len(request_table))
+
+# ============================================
+# STAGE DEADLINES
+# ============================================
+
+STAGE_TIMEOUTS_BY_STATUS = {
+    "analyzing": ANALYSIS_STAGE_TIMEOUT,
+    "analysis_complete": ANALYSIS_STAGE_TIMEOUT,  # only lingers when restored mid-handoff
+    "blockchain_pending": BLOCKCHAIN_STAGE_TIMEOUT,
+}
+
+class StageTimers:
+    """Min-heap of per-request stage deadlines
+    
+    Entries are never removed early: a request that moved on leaves its
+    entry behind, and the entry is dropped when it comes due and no longer
+    matches the request's status and attempt. Arming and expiring are both
+    O(log n) and never scan the request table.
+    """
+    
+    TIMEOUT = "timeout"
+    RETRY = "retry"
+    HEDGE = "hedge"
+    
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+    
+    def __len__(self) -> int:
+        return len(self._heap)
+    
+    def arm(self, request_id: str, status: str, attempt: int, delay: float, action: str = TIMEOUT):
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), request_id, status, attempt, action))
+    
+    def due(self) -> List[tuple]:
+        """Pop every entry whose deadline has passed"""
+        now = time.monotonic()
+        entries = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, request_id, status, attempt, action = heapq.heappop(self._heap)
+            entries.append((request_id, status, attempt, action))
+        return entries
+
+stage_timers = StageTimers()
+
+# Requests whose analysis stage is over (answered, failed or expired). Retries
+# and hedges leave replies outstanding; any that arrive later are dropped here,
+# even once the request itself is gone from the table.
+finished_requests: "OrderedDict[str, None]" = OrderedDict()
+FINISHED_MEMORY = 10000
+
+def tombstone(request_id: str):
+    finished_requests[request_id] = None
+    finished_requests.move_to_end(request_id)
+    while len(finished_requests) > FINISHED_MEMORY:
+        finished_requests.popitem(last=False)
+
+# Requests whose analysis was accepted: request_id -> [monotonic time, answered by the hedge,
+# saved latency already measured]. Entries stay until LRU eviction so every late duplicate
+# (hedge loser, earlier retry) is recognised, even after the request is gone.
+answered_analyses: "OrderedDict[str, list]" = OrderedDict()
+ANSWERED_MEMORY = 10000
+
+def retry_backoff(attempt: int) -> float:
+    """Capped exponential delay before re-dispatch number attempt + 1"""
+    return min(STAGE_RETRY_BACKOFF_MAX, STAGE_RETRY_BACKOFF * 2 ** attempt)
+
+def arm_stage_timer(request_data: dict):
+    """Start the deadline for the request's current stage"""
+    stage_timers.arm(
+        request_data["request_id"], request_data["status"], request_data.get("attempt", 0),
+        STAGE_TIMEOUTS_BY_STATUS[request_data["status"]]
+    )
 
 # ============================================
 # REQUEST PROTOCOL
@@ -128,26 +670,61 @@ async def handle_score_request(ctx: Context, sender: str, msg: ScoreRequest):
     ctx.logger.info(f"Request ID: {msg.request_id}")
     ctx.logger.info(f"From: {sender[:40]}...")
     
-    # Store request
-    request_data = {
+    # Track request
+    analyzer_address = analyzer_ring.pick(msg.wallet_address)
+    
+    if request_table.is_tracked(msg.request_id):
+        ctx.logger.warning(f"⚠️ Duplicate request ignored: {msg.request_id}")
+        return
+    
+    # Same wallet already being scored: share its analysis and on-chain write
+    in_flight = request_table.find_in_flight(msg.wallet_address)
+    if in_flight:
+        request_table.subscribe(in_flight["request_id"], {
+            "request_id": msg.request_id,
+            "requester_agent": sender
+        })
+        DEDUPLICATED.inc()
+        ctx.logger.info(f"🔗 Joined in-flight request {in_flight['request_id']} ({in_flight['status']})")
+        ctx.logger.info("=" * 70)
+        if in_flight["status"] != "analyzing":
+            await send_analysis_to_chat(ctx, in_flight, [msg.request_id])
+        return
+    
+    request_data = request_table.create({
         "request_id": msg.request_id,
         "wallet_address": msg.wallet_address,
         "requester_agent": sender,
+        "analyzer": analyzer_address,
         "created_at": time.time(),
         "status": "analyzing"
-    }
-    
-    store_request(ctx, msg.request_id, request_data)
+    })
     
     ctx.logger.info("=" * 70)
     
-    # Send to analyzer
-    if WALLET_ANALYZER:
-        ctx.logger.info(f"🔀 Routing to analyzer...")
+    await dispatch_analysis(ctx, request_data)
+
+async def dispatch_analysis(ctx: Context, request_data: dict):
+    """Send a request to the analyzer shard owning its wallet and start its deadline"""
+    
+    arm_stage_timer(request_data)
+    analyzer_address = analyzer_ring.pick(request_data["wallet_address"])
+    request_table.update(request_data["request_id"], analyzer=analyzer_address, dispatched_at=time.time())
+    
+    # At most one hedge per request, so retries don't multiply outstanding analyses
+    if ANALYZER_HEDGE_PERCENTILE and len(analyzer_ring.addresses) > 1 and not request_data.get("hedged_to"):
+        stage_timers.arm(
+            request_data["request_id"], "analyzing", request_data.get("attempt", 0),
+            hedge_delay(), StageTimers.HEDGE
+        )
+    
+    if analyzer_address:
+        ANALYSIS_DISPATCHES.inc()
+        ctx.logger.info(f"🔀 Routing to analyzer {analyzer_address[:20]}...")
         try:
-            await ctx.send(WALLET_ANALYZER, ScoreRequest(
-                wallet_address=msg.wallet_address,
-                request_id=msg.request_id,
+            await ctx.send(analyzer_address, ScoreRequest(
+                wallet_address=request_data["wallet_address"],
+                request_id=request_data["request_id"],
                 requester=str(ctx.agent.address)
             ))
             ctx.logger.info(f"✅ Sent to analyzer")
@@ -167,77 +744,168 @@ async def handle_analysis_result(ctx: Context, sender: str, msg: ScoreAnalysis):
     ctx.logger.info(f"Request ID: {msg.request_id}")
     ctx.logger.info(f"Score: {msg.score}/100")
     
+    analyzer_ring.mark_seen(sender)
+    
     # Get request
-    request_data = get_request(ctx, msg.request_id)
+    request_data = request_table.get(msg.request_id)
+    
+    answered = answered_analyses.get(msg.request_id)
+    if answered:
+        # Already answered by another analyzer (hedge or earlier attempt)
+        answered_at, hedge_won, measured = answered
+        if hedge_won and not measured:
+            # The first late reply shows how long the original analyzer would have taken
+            HEDGE_SAVED.observe(time.monotonic() - answered_at)
+            answered[2] = True
+        ctx.logger.info(f"⏭️ Duplicate analysis ignored: {msg.request_id}")
+        return
+    
+    if msg.request_id in finished_requests:
+        ctx.logger.info(f"⏭️ Late analysis ignored (request finished): {msg.request_id}")
+        return
     
     if not request_data:
-        ctx.logger.error(f"❌ CRITICAL: Request not in storage!")
+        ctx.logger.error(f"❌ CRITICAL: Request not tracked!")
         ctx.logger.error(f"   Creating recovery...")
         
         # Recovery
-        request_data = {
+        request_data = request_table.create({
             "request_id": msg.request_id,
             "wallet_address": msg.wallet_address,
             "requester_agent": ASI_ONE_CHAT,
             "created_at": time.time(),
             "status": "analyzing"
-        }
-        store_request(ctx, msg.request_id, request_data)
+        })
     
     # Update request
-    request_data["score"] = msg.score
-    request_data["reputation_level"] = msg.reputation_level
-    request_data["reasoning"] = msg.reasoning_explanation
-    request_data["status"] = "analysis_complete"
-    store_request(ctx, msg.request_id, request_data)
+    try:
+        request_data = request_table.transition(
+            msg.request_id, "analysis_complete",
+            score=msg.score,
+            reputation_level=msg.reputation_level,
+            reasoning=msg.reasoning_explanation,
+            transaction_score=msg.transaction_score,
+            defi_score=msg.defi_score,
+            security_score=msg.security_score,
+            social_score=msg.social_score,
+            metta_rules_applied=msg.metta_rules_applied,
+            score_adjustments=msg.score_adjustments,
+            analysis_data=msg.analysis_data,
+            attempt=0
+        )
+    except InvalidTransition:
+        ctx.logger.warning(f"⚠️ Late analysis ignored ({request_data['status']}): {msg.request_id}")
+        return
+    
+    tombstone(msg.request_id)
+    record_answer(request_data, sender)
     
     ctx.logger.info(f"✅ Score: {msg.score}/100")
     ctx.logger.info("=" * 70)
     
-    # PHASE 1: Send to chat
+    # PHASE 1: Send to chat (the request and everyone who joined it)
     ctx.logger.info("📤 PHASE 1: Sending to chat...")
-    
-    if ASI_ONE_CHAT:
-        try:
-            await ctx.send(ASI_ONE_CHAT, AnalysisComplete(
-                request_id=msg.request_id,
-                wallet_address=msg.wallet_address,
-                score=msg.score,
-                reputation_level=msg.reputation_level,
-                reasoning_explanation=msg.reasoning_explanation,
-                transaction_score=msg.transaction_score,
-                defi_score=msg.defi_score,
-                security_score=msg.security_score,
-                social_score=msg.social_score,
-                metta_rules_applied=msg.metta_rules_applied,
-                timestamp=int(time.time())
-            ))
-            ctx.logger.info("✅ PHASE 1 sent!")
-        except Exception as e:
-            ctx.logger.error(f"❌ Phase 1 failed: {str(e)}")
+    await send_analysis_to_chat(ctx, request_data, subscriber_ids(request_data))
     
     # PHASE 2: Send to blockchain
-    request_data["status"] = "blockchain_pending"
-    store_request(ctx, msg.request_id, request_data)
+    request_data = request_table.transition(msg.request_id, "blockchain_pending")
     
     if BLOCKCHAIN:
         ctx.logger.info("📤 PHASE 2: Sending to blockchain...")
         try:
-            await ctx.send(BLOCKCHAIN, BlockchainUpdate(
-                request_id=msg.request_id,
-                wallet_address=msg.wallet_address,
-                score=msg.score,
-                metta_rules_applied=msg.metta_rules_applied,
-                score_adjustment=msg.score_adjustments,
-                analysis_data=msg.analysis_data
-            ))
+            await dispatch_blockchain(ctx, request_data)
             ctx.logger.info("✅ Sent to blockchain")
         except Exception as e:
             ctx.logger.error(f"❌ Blockchain failed: {str(e)}")
-            await send_blockchain_status_to_chat(ctx, request_data, "failed", None, str(e))
+            await fail_request(ctx, request_data, str(e))
     else:
         ctx.logger.warning("⚠️ Blockchain not configured")
-        await send_blockchain_status_to_chat(ctx, request_data, "failed", None, "Blockchain not configured")
+        await fail_request(ctx, request_data, "Blockchain not configured")
+
+def record_answer(request_data: dict, sender: str):
+    """Track analysis latency and which analyzer won a hedged request"""
+    
+    if request_data.get("dispatched_at"):
+        latency = time.time() - request_data["dispatched_at"]
+        ANALYSIS_LATENCY.observe(latency)
+        analysis_latency.add(latency)
+    
+    hedge_won = bool(request_data.get("hedged_to")) and sender == request_data["hedged_to"]
+    if hedge_won:
+        HEDGE_WINS.inc()
+    answered_analyses[request_data["request_id"]] = [time.monotonic(), hedge_won, False]
+    while len(answered_analyses) > ANSWERED_MEMORY:
+        answered_analyses.popitem(last=False)
+
+def subscriber_ids(request_data: dict) -> List[str]:
+    """Request ids to notify: the request itself and its subscribers"""
+    return [request_data["request_id"]] + [s["request_id"] for s in request_data.get("subscribers", ())]
+
+async def send_analysis_to_chat(ctx: Context, request_data: dict, request_ids: List[str]):
+    """Send the PHASE 1 result under each of the given request ids"""
+    
+    if not ASI_ONE_CHAT:
+        return
+    
+    for request_id in request_ids:
+        try:
+            await ctx.send(ASI_ONE_CHAT, AnalysisComplete(
+                request_id=request_id,
+                wallet_address=request_data["wallet_address"],
+                score=request_data["score"],
+                reputation_level=request_data["reputation_level"],
+                reasoning_explanation=request_data["reasoning"],
+                transaction_score=request_data["transaction_score"],
+                defi_score=request_data["defi_score"],
+                security_score=request_data["security_score"],
+                social_score=request_data["social_score"],
+                metta_rules_applied=request_data["metta_rules_applied"],
+                timestamp=int(time.time())
+            ))
+            ctx.logger.info(f"✅ PHASE 1 sent! ({request_id})")
+        except Exception as e:
+            ctx.logger.error(f"❌ Phase 1 failed for {request_id}: {str(e)}")
+
+async def hedge_analysis(ctx: Context, request_data: dict):
+    """Ask a second analyzer for an analysis that is taking too long"""
+    
+    alternate = analyzer_ring.pick_alternate(request_data["wallet_address"], request_data.get("analyzer"))
+    if not alternate:
+        return
+    request_table.update(request_data["request_id"], hedged_to=alternate)
+    ANALYSIS_HEDGES.inc()
+    ctx.logger.info(f"🪁 Hedging {request_data['request_id']} to {alternate[:20]}...")
+    try:
+        await ctx.send(alternate, ScoreRequest(
+            wallet_address=request_data["wallet_address"],
+            request_id=request_data["request_id"],
+            requester=str(ctx.agent.address)
+        ))
+    except Exception as e:
+        ctx.logger.error(f"❌ Hedge send failed: {str(e)}")
+
+async def dispatch_blockchain(ctx: Context, request_data: dict):
+    """Send a scored request to the blockchain agent and start its deadline"""
+    
+    arm_stage_timer(request_data)
+    await ctx.send(BLOCKCHAIN, BlockchainUpdate(
+        request_id=request_data["request_id"],
+        wallet_address=request_data["wallet_address"],
+        score=request_data["score"],
+        metta_rules_applied=request_data["metta_rules_applied"],
+        score_adjustment=request_data["score_adjustments"],
+        analysis_data=request_data["analysis_data"]
+    ))
+
+async def fail_request(ctx: Context, request_data: dict, error: str):
+    """Mark a request failed and close the chat session with the error"""
+    
+    tombstone(request_data["request_id"])
+    if request_data.get("background"):
+        request_table.delete(request_data["request_id"])
+        return
+    request_data = request_table.transition(request_data["request_id"], "failed", error=error)
+    await send_blockchain_status_to_chat(ctx, request_data, "failed", None, error)
 
 @request_protocol.on_message(model=BlockchainConfirmation)
 async def handle_blockchain_confirmation(ctx: Context, sender: str, msg: BlockchainConfirmation):
@@ -250,25 +918,34 @@ async def handle_blockchain_confirmation(ctx: Context, sender: str, msg: Blockch
     ctx.logger.info(f"Status: {msg.status}")
     
     # Get request
-    request_data = get_request(ctx, msg.request_id)
+    request_data = request_table.get(msg.request_id)
     
     if not request_data:
         ctx.logger.error(f"❌ Request not found!")
         return
     
+    if request_data.get("background"):
+        # Pre-scored from an on-chain request: nobody is waiting in chat
+        if msg.status == "success":
+            ctx.logger.info(f"🔥 Pre-score stored on-chain! TX: {msg.tx_hash}")
+        else:
+            ctx.logger.error(f"❌ Pre-score write failed: {msg.error}")
+        request_table.delete(msg.request_id)
+        return
+    
+    if request_data["status"] != "blockchain_pending":
+        ctx.logger.warning(f"⚠️ Duplicate confirmation ignored ({request_data['status']})")
+        return
+    
     if msg.status == "success":
-        request_data["status"] = "completed"
-        request_data["blockchain_tx"] = msg.tx_hash
-        store_request(ctx, msg.request_id, request_data)
+        request_data = request_table.transition(msg.request_id, "completed", blockchain_tx=msg.tx_hash)
         
         ctx.logger.info(f"🎉 Completed! TX: {msg.tx_hash}")
         
         await send_blockchain_status_to_chat(ctx, request_data, "success", msg.tx_hash, None)
         
     elif msg.status == "error":
-        request_data["status"] = "failed"
-        request_data["error"] = msg.error
-        store_request(ctx, msg.request_id, request_data)
+        request_data = request_table.transition(msg.request_id, "failed", error=msg.error)
         
         ctx.logger.error(f"❌ Failed: {msg.error}")
         
@@ -283,35 +960,236 @@ async def send_blockchain_status_to_chat(ctx: Context, request_data: dict, statu
         ctx.logger.warning("⚠️ Chat not configured")
         return
     
-    ctx.logger.info(f"📤 Sending status ({status})...")
+    request_ids = subscriber_ids(request_data)
+    ctx.logger.info(f"📤 Sending status ({status}) to {len(request_ids)} requests...")
     
-    try:
-        await ctx.send(ASI_ONE_CHAT, BlockchainStatus(
-            request_id=request_data["request_id"],
-            wallet_address=request_data["wallet_address"],
-            status=status,
-            tx_hash=tx_hash,
-            error=error
-        ))
+    sent = 0
+    for request_id in request_ids:
+        try:
+            await ctx.send(ASI_ONE_CHAT, BlockchainStatus(
+                request_id=request_id,
+                wallet_address=request_data["wallet_address"],
+                status=status,
+                tx_hash=tx_hash,
+                error=error
+            ))
+            sent += 1
+        except Exception as e:
+            ctx.logger.error(f"❌ Status send failed for {request_id}: {str(e)}")
+    
+    if sent:
         ctx.logger.info("✅ Status sent!")
-        
         # Cleanup
-        delete_request(ctx, request_data["request_id"])
+        request_table.delete(request_data["request_id"])
+
+@request_protocol.on_message(model=BatchScoreAnalysis)
+async def handle_prescore_results(ctx: Context, sender: str, msg: BatchScoreAnalysis):
+    """Write background pre-scores on-chain"""
+    
+    analyzer_ring.mark_seen(sender)
+    ctx.logger.info(f"🔥 Pre-scores received: {len(msg.results)} wallets ({msg.request_id})")
+    
+    if not BLOCKCHAIN:
+        return
+    
+    for result in msg.results:
+        if "DEFAULT_SCORING" in result.metta_rules_applied or result.analysis_data.get("partial"):
+            # Analysis failed or is incomplete; don't overwrite a real score with it
+            continue
         
-    except Exception as e:
-        ctx.logger.error(f"❌ Status send failed: {str(e)}")
+        request_id = f"{msg.request_id}:{result.wallet_address.lower()}"
+        if request_table.get(request_id):
+            continue
+        request_data = request_table.create({
+            "request_id": request_id,
+            "wallet_address": result.wallet_address,
+            "requester_agent": None,
+            "analyzer": sender,
+            "created_at": time.time(),
+            "score": result.score,
+            "metta_rules_applied": result.metta_rules_applied,
+            "score_adjustments": result.score_adjustments,
+            "analysis_data": result.analysis_data,
+            "status": "blockchain_pending",
+            "background": True
+        })
+        try:
+            await dispatch_blockchain(ctx, request_data)
+        except Exception as e:
+            ctx.logger.error(f"❌ Pre-score blockchain send failed: {str(e)}")
+            request_table.delete(request_id)
+
+@request_protocol.on_message(model=AnalyzerStatus)
+async def handle_analyzer_status(ctx: Context, sender: str, msg: AnalyzerStatus):
+    """Analyzer answered a health check"""
+    analyzer_ring.mark_seen(sender, msg.active_analyses)
 
 # ============================================
 # HEALTH
 # ============================================
 
+@agent.on_interval(period=ANALYZER_HEALTH_INTERVAL)
+async def check_analyzers(ctx: Context):
+    """Ping analyzer shards and rebalance the ring when one stops answering"""
+    global healthy_analyzers
+    
+    for address in analyzer_ring.addresses:
+        try:
+            await ctx.send(address, AnalyzerPing(timestamp=int(time.time())))
+        except Exception as e:
+            ctx.logger.error(f"❌ Ping to {address[:20]}... failed: {str(e)}")
+    
+    healthy = set(analyzer_ring.healthy())
+    for address in healthy_analyzers - healthy:
+        ctx.logger.warning(f"⚠️ Analyzer {address[:20]}... stopped answering, rebalancing its wallets")
+    for address in healthy - healthy_analyzers:
+        ctx.logger.info(f"♻️ Analyzer {address[:20]}... is back, restoring its wallets")
+    healthy_analyzers = healthy
+
+@agent.on_interval(period=PRESCORE_POLL_INTERVAL)
+async def poll_score_requests(ctx: Context):
+    """Queue wallets that requested a score on-chain for low-priority pre-scoring"""
+    
+    if not hedera_w3 or not analyzer_ring.addresses:
+        return
+    
+    try:
+        head = await hedera_w3.eth.block_number
+    except Exception as e:
+        ctx.logger.error(f"❌ Block number failed: {str(e)}")
+        return
+    
+    next_block = ctx.storage.get(PRESCORE_CURSOR_KEY)
+    if next_block is None:
+        next_block = PRESCORE_START_BLOCK or head
+    
+    # Walk the unseen blocks in bounded ranges; the rest waits for the next poll
+    wallets = {}
+    for _ in range(PRESCORE_MAX_RANGES):
+        if next_block > head:
+            break
+        to_block = min(head, next_block + PRESCORE_BLOCK_RANGE - 1)
+        try:
+            for wallet in await fetch_requested_wallets(next_block, to_block):
+                wallets[wallet] = None
+        except Exception as e:
+            ctx.logger.error(f"❌ Score request logs {next_block}-{to_block} failed: {str(e)}")
+            break
+        next_block = to_block + 1
+    
+    ctx.storage.set(PRESCORE_CURSOR_KEY, next_block)
+    
+    if not wallets:
+        return
+    
+    # Each shard warms the wallets it will be asked about later
+    shards: Dict[str, List[str]] = {}
+    for wallet in wallets:
+        shards.setdefault(analyzer_ring.pick(wallet), []).append(wallet)
+    
+    batch_id = f"prescore-{int(time.time())}"
+    for index, (address, shard_wallets) in enumerate(shards.items()):
+        try:
+            await ctx.send(address, PrescoreRequest(
+                wallet_addresses=shard_wallets,
+                request_id=f"{batch_id}-{index}",
+                requester=str(ctx.agent.address)
+            ))
+        except Exception as e:
+            ctx.logger.error(f"❌ Prescore send to {address[:20]}... failed: {str(e)}")
+    
+    ctx.logger.info(f"🔥 Queued {len(wallets)} on-chain score requests for pre-scoring")
+
+@agent.on_interval(period=REQUEST_FLUSH_INTERVAL)
+async def flush_requests(ctx: Context):
+    """Write changed requests to SQLite in one batch"""
+    upserts, deletes = request_table.take_dirty()
+    if not upserts and not deletes:
+        return
+    try:
+        await asyncio.to_thread(request_table.write, upserts, deletes)
+    except Exception as e:
+        ctx.logger.error(f"❌ Request flush failed: {str(e)}")
+        request_table.requeue(upserts, deletes)
+
+@agent.on_interval(period=DEADLINE_CHECK_INTERVAL)
+async def check_deadlines(ctx: Context):
+    """Retry or fail requests whose current stage missed its deadline"""
+    
+    for request_id, status, attempt, action in stage_timers.due():
+        request_data = request_table.get(request_id)
+        if not request_data or request_data["status"] != status or request_data.get("attempt", 0) != attempt:
+            continue  # the stage finished or was already retried
+        
+        stage = "analysis" if status == "analyzing" else "blockchain"
+        if action == StageTimers.HEDGE:
+            if not request_data.get("hedged_to"):
+                await hedge_analysis(ctx, request_data)
+            continue
+        if action == StageTimers.RETRY:
+            STAGE_RETRIES.labels(stage).inc()
+            request_data = request_table.update(request_id, attempt=attempt + 1)
+            ctx.logger.warning(f"🔁 Re-dispatching {stage} for {request_id} (attempt {attempt + 2})")
+            try:
+                if status == "analyzing":
+                    await dispatch_analysis(ctx, request_data)
+                else:
+                    if status == "analysis_complete":
+                        # Scored but never handed to the blockchain agent
+                        request_data = request_table.transition(request_id, "blockchain_pending")
+                    await dispatch_blockchain(ctx, request_data)
+            except Exception as e:
+                ctx.logger.error(f"❌ Re-dispatch failed: {str(e)}")
+            continue
+        
+        STAGE_TIMEOUTS.labels(stage).inc()
+        if attempt < STAGE_MAX_RETRIES:
+            delay = retry_backoff(attempt)
+            ctx.logger.warning(f"⏰ {stage} timed out for {request_id}, retrying in {delay:.1f}s")
+            stage_timers.arm(request_id, status, attempt, delay, StageTimers.RETRY)
+        else:
+            STAGE_FAILURES.labels(stage).inc()
+            ctx.logger.error(f"❌ {stage} timed out for {request_id} after {attempt + 1} attempts")
+            await fail_request(ctx, request_data, f"No {stage} response after {attempt + 1} attempts")
+
+@agent.on_interval(period=STORAGE_SWEEP_INTERVAL)
+async def sweep_storage(ctx: Context):
+    """Expire requests that never finished and compact the backing stores"""
+    
+    expired = request_table.expire(REQUEST_TTL)
+    for data in expired:
+        EXPIRED.labels(data["status"]).inc()
+        tombstone(data["request_id"])
+    if expired:
+        ctx.logger.warning(f"🧹 Expired {len(expired)} stale requests")
+    
+    # Requests used to live in ctx.storage, "deleted" by setting them to None
+    purged = remove_storage_keys(ctx.storage, storage_keys(ctx.storage, "req_"))
+    if purged:
+        ctx.logger.info(f"🧹 Removed {purged} legacy request keys from agent storage")
+    
+    await flush_requests(ctx)
+    try:
+        if await asyncio.to_thread(request_table.compact):
+            ctx.logger.info("🧹 Request database vacuumed")
+        STORAGE_BYTES.labels('requests_db').set(request_table.size_bytes())
+    except Exception as e:
+        ctx.logger.error(f"❌ Request database compaction failed: {str(e)}")
+    size = storage_size(ctx.storage)
+    if size is not None:
+        STORAGE_BYTES.labels('agent_storage').set(size)
+
 @agent.on_interval(period=60.0)
 async def health_check(ctx: Context):
     ctx.logger.info(f"""
 📊 Health:
    Chat: {'✅' if ASI_ONE_CHAT else '❌'}
-   Analyzer: {'✅' if WALLET_ANALYZER else '❌'}
+   Analyzers: {len(healthy_analyzers)}/{len(analyzer_ring.addresses)} healthy {analyzer_ring.stats()}
    Blockchain: {'✅' if BLOCKCHAIN else '❌'}
+   Requests: {request_table.counts()} {request_table.stats()} ({request_table.size_bytes()} bytes on disk)
+   Stage timers: {len(stage_timers)}
+   Hedging: {f'p{ANALYZER_HEDGE_PERCENTILE:g}, currently after {hedge_delay():.1f}s' if ANALYZER_HEDGE_PERCENTILE else '❌'}
+   Pre-scoring: {f'from block {ctx.storage.get(PRESCORE_CURSOR_KEY)}' if hedera_w3 else '❌'}
     """)
 
 # ============================================
@@ -327,9 +1205,32 @@ async def startup(ctx: Context):
     ctx.logger.info("")
     ctx.logger.info("ADDRESSES:")
     ctx.logger.info(f"Chat: {ASI_ONE_CHAT[:40] if ASI_ONE_CHAT else '❌'}")
-    ctx.logger.info(f"Analyzer: {WALLET_ANALYZER[:40] if WALLET_ANALYZER else '❌'}")
+    ctx.logger.info(f"Analyzers: {len(analyzer_ring.addresses) or '❌'}")
+    for address in analyzer_ring.addresses:
+        ctx.logger.info(f"   {address[:40]}")
     ctx.logger.info(f"Blockchain: {BLOCKCHAIN[:40] if BLOCKCHAIN else '❌'}")
     ctx.logger.info("=" * 70)
+    
+    restored = request_table.load()
+    if restored:
+        ctx.logger.info(f"♻️ Restored {restored} requests: {request_table.counts()}")
+        # Replies may have been lost with the old process; give each stage a fresh deadline
+        for request_id in request_table.ids():
+            request_data = request_table.get(request_id)
+            if request_data["status"] in STAGE_TIMEOUTS_BY_STATUS:
+                arm_stage_timer(request_data)
+    
+    if ORCHESTRATOR_METRICS_PORT:
+        try:
+            start_http_server(ORCHESTRATOR_METRICS_PORT, addr=METRICS_HOST)
+            ctx.logger.info(f"Metrics: http://{METRICS_HOST}:{ORCHESTRATOR_METRICS_PORT}/metrics")
+        except OSError as e:
+            ctx.logger.error(f"❌ Metrics server failed: {str(e)}")
+
+@agent.on_event("shutdown")
+async def shutdown(ctx: Context):
+    """Write out pending request changes"""
+    request_table.close()
 
 # ============================================
 # INCLUDE
@@ -0,0 +1,87 @@
+# RPC ENDPOINTS - endpoint health and ranking shared by the pooled RPC clients
+
+import os
+import time
+from typing import Dict, List, Optional
+
+RPC_HEDGE_DELAY = float(os.getenv("RPC_HEDGE_DELAY", "0"))  # seconds; 0 = adaptive
+RPC_HEDGE_DEFAULT_DELAY = float(os.getenv("RPC_HEDGE_DEFAULT_DELAY", "1.0"))  # before any latency sample
+RPC_HEDGE_MIN_DELAY = float(os.getenv("RPC_HEDGE_MIN_DELAY", "0.05"))
+RPC_HEDGE_MAX_DELAY = float(os.getenv("RPC_HEDGE_MAX_DELAY", "2.0"))
+RPC_EJECT_FAILURES = int(os.getenv("RPC_EJECT_FAILURES", "3"))
+RPC_EJECT_SECONDS = float(os.getenv("RPC_EJECT_SECONDS", "30"))
+
+# Writes must not be duplicated by hedging
+NON_HEDGED_METHODS = {'eth_sendRawTransaction', 'eth_sendTransaction'}
+
+class EndpointHealth:
+    """Rolling latency and error rate of one RPC endpoint"""
+    
+    ALPHA = 0.2  # EWMA weight of the newest sample
+    
+    def __init__(self, url: str, timeout: float):
+        self.url = url
+        self.timeout = timeout  # latency charged to an endpoint that has only failed
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+    
+    def record_success(self, latency: float):
+        self.requests += 1
+        self.consecutive_failures = 0
+        self.record_latency(latency)
+        self.error_rate *= 1 - self.ALPHA
+    
+    def record_latency(self, latency: float):
+        self.latency = latency if self.latency is None else (1 - self.ALPHA) * self.latency + self.ALPHA * latency
+    
+    def record_failure(self):
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.error_rate = (1 - self.ALPHA) * self.error_rate + self.ALPHA
+        if self.consecutive_failures >= RPC_EJECT_FAILURES:
+            self.ejected_until = time.monotonic() + RPC_EJECT_SECONDS
+            self.consecutive_failures = 0
+    
+    def is_available(self, now: float) -> bool:
+        return now >= self.ejected_until
+    
+    def score(self) -> float:
+        """Lower is better; untried endpoints are tried first"""
+        if self.latency is None:
+            latency = 0.0 if self.failures == 0 else self.timeout
+        else:
+            latency = self.latency
+        return latency * (1 + 4 * self.error_rate)
+    
+    def hedge_delay(self) -> float:
+        if RPC_HEDGE_DELAY > 0:
+            return RPC_HEDGE_DELAY
+        if self.latency is None:
+            return RPC_HEDGE_DEFAULT_DELAY
+        return min(RPC_HEDGE_MAX_DELAY, max(RPC_HEDGE_MIN_DELAY, 3 * self.latency))
+    
+    def stats(self) -> dict:
+        return {
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'error_rate': round(self.error_rate, 3),
+            'ejected': not self.is_available(time.monotonic()),
+            'requests': self.requests,
+            'failures': self.failures
+        }
+
+def rank_endpoints(endpoints: List[EndpointHealth]) -> List[EndpointHealth]:
+    """Available endpoints, healthiest first"""
+    now = time.monotonic()
+    available = [endpoint for endpoint in endpoints if endpoint.is_available(now)]
+    if not available:
+        # Everything ejected: use whichever comes back first
+        available = [min(endpoints, key=lambda endpoint: endpoint.ejected_until)]
+    return sorted(available, key=lambda endpoint: endpoint.score())
+
+def endpoint_stats(endpoints: List[EndpointHealth]) -> Dict[str, dict]:
+    return {endpoint.url: endpoint.stats() for endpoint in endpoints}
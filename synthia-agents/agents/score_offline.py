@@ -0,0 +1,334 @@
+# BULK OFFLINE WALLET SCORING
+#
+# Scores wallets from pre-exported transaction files with the wallet
+# analyzer's scoring logic, without the agent message path or live APIs.
+#
+# Input rows are Etherscan txlist fields (timeStamp, gasUsed, isError, to,
+# optionally from) plus a wallet column, grouped by wallet: all of a
+# wallet's rows must be contiguous, as in per-wallet exports. CSV is split
+# into raw row blocks that workers parse; Parquet needs pyarrow. Output is
+# Parquet (pyarrow) or CSV, one row per wallet, in input order.
+#
+#   python score_offline.py txs.csv scores.parquet --workers 16
+#   python score_offline.py txs.parquet scores.csv --balances balances.csv
+#
+# --balances is a CSV with address,balance (ETH),nonce columns; without it,
+# wallets score with a zero balance and their outgoing row count as nonce.
+
+import argparse
+import csv
+import io
+import itertools
+import operator
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from wallet_analyzer import (
+    analyzer, address_labels, addresses_to_bytes, TransactionStats, LABEL_NAMES
+)
+
+TX_COLUMNS = ('timeStamp', 'gasUsed', 'isError', 'to')
+OUTPUT_COLUMNS = (
+    'wallet', 'score', 'transaction_score', 'defi_score', 'security_score',
+    'social_score', 'score_adjustments', 'reputation_level', 'metta_rules_applied'
+)
+NO_TIMESTAMP = np.iinfo(np.int64).max
+
+# ============================================
+# WORKER
+# ============================================
+
+balance_index = None  # (sorted S20 keys, balances, nonces), set per worker
+
+def init_worker(balances):
+    global balance_index
+    balance_index = balances
+
+def int_column(values) -> np.ndarray:
+    """Decimal strings to int64, treating blanks and bad values as 0"""
+    try:
+        return np.array([value or 0 for value in values], dtype=np.int64)
+    except (TypeError, ValueError, OverflowError):
+        def to_int(value):
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return 0
+        return np.fromiter((to_int(value) for value in values), dtype=np.int64, count=len(values))
+
+def parse_csv_block(header: list, data: bytes, wallet_column: str) -> dict:
+    """Columns needed for scoring from a block of raw CSV rows"""
+    names = [wallet_column, *TX_COLUMNS] + (['from'] if 'from' in header else [])
+    pick = operator.itemgetter(*(header.index(name) for name in names))
+    width = len(header)
+    lines = io.StringIO(data.decode('utf-8', errors='replace'), newline='')
+    rows = (pick(row) for row in csv.reader(lines) if len(row) >= width)
+    columns = dict(zip(['wallet', *names[1:]], map(list, zip(*rows))))
+    return columns or {name: [] for name in ['wallet', *names[1:]]}
+
+def wallet_balances(wallets: np.ndarray):
+    """Balance and nonce per wallet from the --balances index (None when absent)"""
+    if balance_index is None:
+        return None, None
+    keys, balances, nonces = balance_index
+    wallet_keys, valid = addresses_to_bytes(wallets)
+    positions = np.minimum(np.searchsorted(keys, wallet_keys), len(keys) - 1)
+    found = valid & (keys[positions] == wallet_keys)
+    return (
+        np.where(found, balances[positions], 0.0),
+        np.where(found, nonces[positions], -1)
+    )
+
+def score_block(block: dict) -> dict:
+    """Score every wallet in a block of rows grouped by wallet"""
+    if 'data' in block:
+        block = parse_csv_block(block['header'], block['data'], block['wallet_column'])
+
+    wallet = np.char.lower(np.asarray(block['wallet'], dtype='U42'))
+    rows = len(wallet)
+    if rows == 0:
+        return {name: [] for name in OUTPUT_COLUMNS}
+
+    timestamps = int_column(block['timeStamp'])
+    gas_used = int_column(block['gasUsed'])
+    is_error = np.asarray([value in ('1', 1, True) for value in block['isError']], dtype=np.int64)
+
+    # Per-row counterparty labels, looked up once per distinct address
+    to_addresses, to_ids = np.unique(
+        np.char.lower(np.asarray(block['to'], dtype='U42')), return_inverse=True
+    )
+    labels = address_labels.lookup(to_addresses)[to_ids.ravel()]
+
+    # Contiguous wallet runs -> per-wallet reductions
+    starts = np.flatnonzero(np.r_[True, wallet[1:] != wallet[:-1]])
+    counts = np.diff(np.r_[starts, rows])
+    group = np.repeat(np.arange(len(starts)), counts)
+
+    failed = np.add.reduceat(is_error, starts)
+    gas_sums = np.add.reduceat(gas_used, starts)
+    first = np.minimum.reduceat(np.where(timestamps > 0, timestamps, NO_TIMESTAMP), starts)
+    last = np.maximum.reduceat(np.where(timestamps > 0, timestamps, 0), starts)
+    label_counts = np.bincount(
+        group * len(LABEL_NAMES) + labels, minlength=len(starts) * len(LABEL_NAMES)
+    ).reshape(len(starts), len(LABEL_NAMES))
+
+    wallets = wallet[starts]
+    if 'from' in block:
+        outgoing = np.char.lower(np.asarray(block['from'], dtype='U42')) == wallet
+        sent = np.add.reduceat(outgoing.astype(np.int64), starts)
+    else:
+        sent = counts
+    balances, nonces = wallet_balances(wallets)
+
+    output = {name: [] for name in OUTPUT_COLUMNS}
+    for i, address in enumerate(wallets):
+        stats = TransactionStats()
+        stats.count = int(counts[i])
+        stats.failed = int(failed[i])
+        stats.gas_used_sum = int(gas_sums[i])
+        stats.label_counts = label_counts[i]
+        if first[i] != NO_TIMESTAMP:
+            stats.first_timestamp = int(first[i])
+            stats.last_timestamp = int(last[i])
+
+        balance = float(balances[i]) if balances is not None else 0.0
+        tx_count = int(nonces[i]) if nonces is not None and nonces[i] >= 0 else int(sent[i])
+
+        result = analyzer.compute_scores(str(address), balance, tx_count, stats)
+        output['wallet'].append(str(address))
+        for name in OUTPUT_COLUMNS[1:]:
+            output[name].append(result[name])
+    return output
+
+# ============================================
+# INPUT
+# ============================================
+
+def split_at_wallet(wallets) -> int:
+    """Index where the block's last wallet run starts (it may continue in the next block)"""
+    last = wallets[-1]
+    i = len(wallets) - 1
+    while i > 0 and wallets[i - 1] == last:
+        i -= 1
+    return i
+
+def read_csv_blocks(path: str, wallet_column: str, block_rows: int):
+    """Yield blocks of raw CSV rows cut at wallet boundaries; workers parse them"""
+    with open(path, 'rb') as f:
+        header = next(csv.reader([f.readline().decode('utf-8-sig')]))
+        missing = {wallet_column, *TX_COLUMNS} - set(header)
+        if missing:
+            raise ValueError(f"{path} is missing columns: {', '.join(sorted(missing))}")
+        wallet_index = header.index(wallet_column)
+
+        def wallet_of(line: bytes) -> str:
+            row = next(csv.reader([line.decode('utf-8', errors='replace')]), [])
+            return row[wallet_index].lower() if wallet_index < len(row) else ''
+
+        carry = []
+        while True:
+            lines = list(itertools.islice(f, block_rows))
+            if not lines:
+                break
+            lines = carry + lines
+            # Only the block's tail is parsed here, to find the last wallet run
+            last_wallet = wallet_of(lines[-1])
+            cut = len(lines) - 1
+            while cut > 0 and wallet_of(lines[cut - 1]) == last_wallet:
+                cut -= 1
+            if cut == 0:
+                carry = lines  # a single wallet larger than the block; keep reading
+                continue
+            yield {'header': header, 'data': b''.join(lines[:cut]), 'wallet_column': wallet_column}
+            carry = lines[cut:]
+        if carry:
+            yield {'header': header, 'data': b''.join(carry), 'wallet_column': wallet_column}
+
+def read_parquet_blocks(path: str, wallet_column: str, block_rows: int):
+    """Yield column blocks from Parquet row batches cut at wallet boundaries"""
+    if pq is None:
+        raise ValueError("Reading Parquet requires pyarrow (pip install pyarrow)")
+    parquet = pq.ParquetFile(path)
+    names = set(parquet.schema_arrow.names)
+    missing = {wallet_column, *TX_COLUMNS} - names
+    if missing:
+        raise ValueError(f"{path} is missing columns: {', '.join(sorted(missing))}")
+    wanted = [wallet_column, *TX_COLUMNS] + (['from'] if 'from' in names else [])
+
+    carry = None
+    for batch in parquet.iter_batches(batch_size=block_rows, columns=wanted):
+        block = {
+            ('wallet' if name == wallet_column else name): batch.column(name).to_numpy(zero_copy_only=False).astype(str)
+            for name in wanted
+        }
+        if carry is not None:
+            block = {name: np.concatenate([carry[name], values]) for name, values in block.items()}
+        cut = split_at_wallet(np.char.lower(block['wallet']))
+        if cut == 0:
+            carry = block
+            continue
+        yield {name: values[:cut] for name, values in block.items()}
+        carry = {name: values[cut:] for name, values in block.items()}
+    if carry is not None:
+        yield carry
+
+def load_balances(path: str):
+    """Sorted (keys, balances, nonces) arrays from an address,balance,nonce CSV"""
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    keys, valid = addresses_to_bytes([row['address'].strip().lower() for row in rows])
+    balances = np.array([float(row.get('balance') or 0) for row in rows])[valid]
+    nonces = int_column([row.get('nonce') for row in rows])[valid]
+    keys = keys[valid]
+    order = np.argsort(keys, kind='stable')
+    return keys[order], balances[order], nonces[order]
+
+# ============================================
+# OUTPUT
+# ============================================
+
+class CSVScoreWriter:
+    def __init__(self, path: str):
+        self.file = open(path, 'w', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(OUTPUT_COLUMNS)
+
+    def write(self, output: dict):
+        output = dict(output, metta_rules_applied=[';'.join(rules) for rules in output['metta_rules_applied']])
+        self.writer.writerows(zip(*(output[name] for name in OUTPUT_COLUMNS)))
+
+    def close(self):
+        self.file.close()
+
+class ParquetScoreWriter:
+    def __init__(self, path: str):
+        self.schema = pa.schema([
+            ('wallet', pa.string()),
+            ('score', pa.int16()),
+            ('transaction_score', pa.int16()),
+            ('defi_score', pa.int16()),
+            ('security_score', pa.int16()),
+            ('social_score', pa.int16()),
+            ('score_adjustments', pa.int16()),
+            ('reputation_level', pa.dictionary(pa.int8(), pa.string())),
+            ('metta_rules_applied', pa.list_(pa.string()))
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, output: dict):
+        self.writer.write_table(pa.table(output, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+def open_writer(path: str):
+    if path.endswith('.parquet'):
+        if pa is None:
+            raise ValueError("Writing Parquet requires pyarrow (pip install pyarrow); use a .csv output")
+        return ParquetScoreWriter(path)
+    return CSVScoreWriter(path)
+
+# ============================================
+# MAIN
+# ============================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Score wallets from exported transaction files")
+    parser.add_argument("input_path", help="Transactions (.csv or .parquet), grouped by wallet")
+    parser.add_argument("output_path", help="Scores (.parquet or .csv)")
+    parser.add_argument("--wallet-column", default="wallet", help="Column holding the scored wallet")
+    parser.add_argument("--balances", help="CSV with address,balance,nonce columns")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--block-rows", type=int, default=50000, help="Rows per work unit")
+    args = parser.parse_args()
+
+    try:
+        if args.input_path.endswith('.parquet'):
+            blocks = read_parquet_blocks(args.input_path, args.wallet_column, args.block_rows)
+        else:
+            blocks = read_csv_blocks(args.input_path, args.wallet_column, args.block_rows)
+        balances = load_balances(args.balances) if args.balances else None
+        writer = open_writer(args.output_path)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+
+    started = time.perf_counter()
+    wallets = 0
+    # Bounded window of blocks in flight; results are written in input order
+    pending = deque()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, initargs=(balances,)) as pool:
+            for block in blocks:
+                pending.append(pool.submit(score_block, block))
+                if len(pending) >= 2 * args.workers:
+                    output = pending.popleft().result()
+                    writer.write(output)
+                    wallets += len(output['wallet'])
+            while pending:
+                output = pending.popleft().result()
+                writer.write(output)
+                wallets += len(output['wallet'])
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Scored {wallets} wallets in {elapsed:.1f}s ({wallets / max(elapsed, 1e-9):.0f}/s) -> {args.output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,26 @@
 # WALLET ANALYZER AGENT - Ethereum Analysis
 
 from uagents import Context, Protocol, Model, Agent
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple, AsyncIterator, Iterator
 import os
 import time
 import json
-import requests
-from web3 import Web3
+import copy
+import asyncio
+import sqlite3
+import heapq
+import operator
+import itertools
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+import aiohttp
+import numpy as np
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, start_http_server
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from web3 import Web3, AsyncWeb3
+from web3.providers.async_base import AsyncJSONBaseProvider
+from rpc_endpoints import NON_HEDGED_METHODS, EndpointHealth, endpoint_stats, rank_endpoints
 
 # ============================================
 # MESSAGE MODELS
@@ -33,24 +47,1324 @@ class ScoreAnalysis(Model):
     analysis_data: dict
     timestamp: int
 
+class BatchScoreRequest(Model):
+    wallet_addresses: List[str]
+    request_id: str
+    requester: Optional[str] = None
+
+class BatchScoreAnalysis(Model):
+    request_id: str
+    analyzer_id: str
+    results: List[ScoreAnalysis]
+    timestamp: int
+
+class PrescoreRequest(Model):
+    wallet_addresses: List[str]
+    request_id: str
+    requester: Optional[str] = None
+
+class AnalyzerPing(Model):
+    timestamp: int
+
+class AnalyzerStatus(Model):
+    analyzer_id: str
+    active_analyses: int
+    timestamp: int
+
 # ============================================
 # CONFIGURATION
 # ============================================
 
 ORCHESTRATOR_ADDRESS = os.getenv("ORCHESTRATOR_ADDRESS", "")
+ANALYZER_SEED = os.getenv("ANALYZER_SEED") or "uOYftGLet3q_Ab0ggA6OGbnqZr3feV9wuMD4xBkvoLk"
+ANALYZER_PORT = int(os.getenv("ANALYZER_PORT", "8001"))
+ANALYZER_ENDPOINT = os.getenv("ANALYZER_ENDPOINT", f"http://localhost:{ANALYZER_PORT}/submit")
 ETHERSCAN_API_KEY = os.getenv("ETHERSCAN_API_KEY", "")
 ANALYZER_EVM_PRIVATE_KEY = os.getenv("ANALYZER_EVM_PRIVATE_KEY", "")
 
-# Ethereum RPC
-ETH_RPC_URL = "https://eth.llamarpc.com"
-w3 = Web3(Web3.HTTPProvider(ETH_RPC_URL))
+# Ethereum RPC (comma-separated endpoints, pooled with failover)
+ETH_RPC_URLS = [url.strip() for url in os.getenv("ETH_RPC_URLS", "https://eth.llamarpc.com").split(",") if url.strip()]
+ETHERSCAN_API_URL = "https://api.etherscan.io/api"
+
+# Shared HTTP session (keep-alive connection pool for RPC + Etherscan)
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))
+MAX_CONCURRENT_ANALYSES = int(os.getenv("MAX_CONCURRENT_ANALYSES", "50"))
+# Bulk and background analyses may hold at most this many slots; the rest stay free for interactive requests
+MAX_BULK_ANALYSES = int(os.getenv("MAX_BULK_ANALYSES", str(max(1, MAX_CONCURRENT_ANALYSES // 2))))
+
+# Analysis deadlines (seconds from receipt); sources that miss their budget
+# are left out and the result is flagged partial
+ANALYSIS_DEADLINE_SECONDS = float(os.getenv("ANALYSIS_DEADLINE_SECONDS", "12"))
+BATCH_ANALYSIS_DEADLINE_SECONDS = float(os.getenv("BATCH_ANALYSIS_DEADLINE_SECONDS", "120"))
+RPC_STAGE_BUDGET_SECONDS = float(os.getenv("RPC_STAGE_BUDGET_SECONDS", "3"))
+SCORING_RESERVE_SECONDS = float(os.getenv("SCORING_RESERVE_SECONDS", "0.5"))
+
+# Etherscan request scheduling (free tier: 5 calls/sec)
+ETHERSCAN_RATE_LIMIT = float(os.getenv("ETHERSCAN_RATE_LIMIT", "5"))
+ETHERSCAN_BURST = int(os.getenv("ETHERSCAN_BURST", "5"))
+ETHERSCAN_MAX_QUEUE = int(os.getenv("ETHERSCAN_MAX_QUEUE", "1000"))
+ETHERSCAN_MAX_RETRIES = int(os.getenv("ETHERSCAN_MAX_RETRIES", "3"))
+
+# Request priorities (lower runs first)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+PRIORITY_BACKGROUND = 2  # cache warming from on-chain score requests
+
+# MeTTa rules (JSON file; built-in rules when unset)
+METTA_RULES_PATH = os.getenv("METTA_RULES_PATH", "")
+METTA_RULES_RELOAD_INTERVAL = float(os.getenv("METTA_RULES_RELOAD_INTERVAL", "30"))
+
+# Prometheus metrics endpoint (0 disables)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9001"))
+
+# Batch scoring
+MAX_BATCH_WALLETS = int(os.getenv("MAX_BATCH_WALLETS", "1000"))
+RPC_BATCH_SIZE = int(os.getenv("RPC_BATCH_SIZE", "200"))  # calls per JSON-RPC batch
+
+# Analysis result cache
+ANALYSIS_CACHE_DURATION = float(os.getenv("ANALYSIS_CACHE_DURATION", "300"))
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "10000"))
+
+# Negative cache for addresses rejected locally or by Etherscan
+NEGATIVE_CACHE_TTL = float(os.getenv("NEGATIVE_CACHE_TTL", "60"))
+NEGATIVE_CACHE_SIZE = int(os.getenv("NEGATIVE_CACHE_SIZE", "10000"))
+
+# Per-upstream circuit breakers (RPC pool, Etherscan)
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))  # consecutive failures
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))  # open -> half-open
+BREAKER_HALF_OPEN_CALLS = int(os.getenv("BREAKER_HALF_OPEN_CALLS", "1"))  # concurrent probes
+
+# Local transaction history store
+TX_STORE_PATH = os.getenv("TX_STORE_PATH", "wallet_transactions.db")
+
+# Paginated history ingestion (Etherscan caps a page at 10000 rows)
+ETHERSCAN_PAGE_SIZE = int(os.getenv("ETHERSCAN_PAGE_SIZE", "1000"))
+TX_HISTORY_MAX_PAGES = int(os.getenv("TX_HISTORY_MAX_PAGES", "100"))
+
+DEFI_PROTOCOLS = frozenset([
+    '0x7a250d5630b4cf539739df2c5dacb4c659f2488d',  # Uniswap V2
+    '0xe592427a0aece92de3edee1f18e0157c05861564',  # Uniswap V3
+    '0x68b3465833fb72a70ecdf485e0e4c7bd8665fc45',  # Uniswap Universal Router
+    '0x1111111254eeb25477b68fb85ed929f73a960582',  # 1inch
+    '0xdef1c0ded9bec7f1a1670819833240f027b25eff',  # 0x Protocol
+])
+
+# Address label index (built with build_label_index.py; DeFi routers above when unset)
+ADDRESS_LABELS_PATH = os.getenv("ADDRESS_LABELS_PATH", "")
 
 agent = Agent(
     name="wallet_analyzer",
-    seed="uOYftGLet3q_Ab0ggA6OGbnqZr3feV9wuMD4xBkvoLk",
-    port=8001,
-    endpoint=["http://localhost:8001/submit"]
+    seed=ANALYZER_SEED,
+    port=ANALYZER_PORT,
+    endpoint=[ANALYZER_ENDPOINT]
+)
+
+# ============================================
+# METRICS
+# ============================================
+
+STAGE_SECONDS = Histogram(
+    'synthia_analyzer_stage_seconds',
+    'Time spent per analysis stage',
+    ['stage'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
 )
+IN_FLIGHT = Gauge('synthia_analyzer_in_flight', 'Stages currently in progress', ['stage'])
+ERRORS = Counter('synthia_analyzer_errors_total', 'Errors by source and cause', ['source', 'cause'])
+PARTIAL = Counter('synthia_analyzer_partial_total', 'Analyses scored without a source', ['source'])
+
+@contextmanager
+def timed_stage(stage: str):
+    """Time a stage and track it as in flight"""
+    IN_FLIGHT.labels(stage).inc()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        IN_FLIGHT.labels(stage).dec()
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+
+def classify_error(error: BaseException) -> str:
+    """Map an exception to a metrics cause label"""
+    if isinstance(error, CircuitOpen):
+        return 'circuit_open'
+    if isinstance(error, asyncio.TimeoutError):
+        return 'timeout'
+    if isinstance(error, (EtherscanThrottled, SchedulerQueueFull)) or getattr(error, 'status', None) == 429:
+        return 'throttled'
+    if isinstance(error, EtherscanError):
+        return 'upstream'
+    if isinstance(error, HistoryTruncated):
+        return 'truncated'
+    if isinstance(error, (ValueError, KeyError, TypeError, IndexError, aiohttp.ContentTypeError)):
+        return 'parse'
+    if isinstance(error, aiohttp.ClientResponseError):
+        return 'http'
+    if isinstance(error, (aiohttp.ClientError, OSError)):
+        return 'connection'
+    return 'other'
+
+def record_error(source: str, error: BaseException) -> str:
+    """Count an error by source and cause; returns the cause"""
+    cause = classify_error(error)
+    ERRORS.labels(source, cause).inc()
+    return cause
+
+class AnalyzerCollector:
+    """Exports cache, scheduler and coalescing counters kept by the analyzer"""
+    
+    def __init__(self, analyzer: "WalletAnalyzer"):
+        self.analyzer = analyzer
+    
+    def collect(self):
+        cache = self.analyzer.cache.stats()
+        cache_events = CounterMetricFamily(
+            'synthia_analyzer_cache_events', 'Analysis cache events', labels=['event']
+        )
+        for event in ('hits', 'misses', 'evictions', 'invalidations'):
+            cache_events.add_metric([event], cache[event])
+        yield cache_events
+        yield GaugeMetricFamily('synthia_analyzer_cache_size', 'Cached analyses', value=cache['size'])
+        
+        negative = self.analyzer.negative_cache.stats()
+        yield CounterMetricFamily(
+            'synthia_analyzer_negative_cache_hits', 'Requests answered from the negative cache',
+            value=negative['hits']
+        )
+        yield GaugeMetricFamily('synthia_analyzer_negative_cache_size', 'Negatively cached addresses', value=negative['size'])
+        
+        state = GaugeMetricFamily(
+            'synthia_analyzer_circuit_state', 'Circuit state per upstream (0 closed, 1 half-open, 2 open)',
+            labels=['upstream']
+        )
+        rejected = CounterMetricFamily(
+            'synthia_analyzer_circuit_rejected', 'Calls failed fast by an open circuit', labels=['upstream']
+        )
+        for name, breaker in self.analyzer.breakers.items():
+            state.add_metric([name], CircuitBreaker.STATE_VALUES[breaker.state])
+            rejected.add_metric([name], breaker.rejected)
+        yield state
+        yield rejected
+        
+        scheduler = self.analyzer.etherscan_scheduler.stats()
+        yield GaugeMetricFamily(
+            'synthia_analyzer_etherscan_queue_depth', 'Etherscan calls waiting for a token',
+            value=scheduler['queued']
+        )
+        yield CounterMetricFamily(
+            'synthia_analyzer_etherscan_rejected', 'Etherscan calls rejected by a full queue',
+            value=scheduler['rejected']
+        )
+        yield CounterMetricFamily(
+            'synthia_analyzer_coalesced', 'Analyses served by joining an in-flight run',
+            value=self.analyzer.coalesced
+        )
+        
+        pool = self.analyzer.rpc_pool
+        yield CounterMetricFamily('synthia_analyzer_rpc_hedged', 'RPC calls hedged to a second endpoint', value=pool.hedged)
+        latency = GaugeMetricFamily('synthia_analyzer_rpc_latency_seconds', 'EWMA latency per RPC endpoint', labels=['endpoint'])
+        error_rate = GaugeMetricFamily('synthia_analyzer_rpc_error_rate', 'EWMA error rate per RPC endpoint', labels=['endpoint'])
+        ejected = GaugeMetricFamily('synthia_analyzer_rpc_ejected', 'RPC endpoint currently ejected', labels=['endpoint'])
+        now = time.monotonic()
+        for endpoint in pool.endpoints:
+            if endpoint.latency is not None:
+                latency.add_metric([endpoint.url], endpoint.latency)
+            error_rate.add_metric([endpoint.url], endpoint.error_rate)
+            ejected.add_metric([endpoint.url], 0 if endpoint.is_available(now) else 1)
+        yield latency
+        yield error_rate
+        yield ejected
+
+# ============================================
+# RPC POOL
+# ============================================
+
+class RPCPool:
+    """JSON-RPC over several endpoints: latency-aware routing, hedging, failover
+    
+    Each call goes to the healthiest endpoint. If it hasn't answered within
+    its hedge delay, the next endpoint is raced against it; if it fails, the
+    next endpoint is tried immediately. Endpoints that fail repeatedly are
+    ejected for RPC_EJECT_SECONDS.
+    """
+    
+    def __init__(self, urls: List[str], get_session, breaker: Optional["CircuitBreaker"] = None):
+        self.endpoints = [EndpointHealth(url, HTTP_TIMEOUT_SECONDS) for url in urls]
+        self.get_session = get_session
+        self.breaker = breaker or CircuitBreaker('rpc')
+        self.hedged = 0
+    
+    async def post(self, endpoint: EndpointHealth, body: bytes) -> bytes:
+        session = await self.get_session()
+        started = time.perf_counter()
+        try:
+            async with session.post(endpoint.url, data=body,
+                                    headers={'Content-Type': 'application/json'}) as response:
+                if response.status == 429 or response.status >= 500:
+                    response.raise_for_status()
+                raw = await response.read()
+        except asyncio.CancelledError:
+            # Lost a hedge race: not a failure, but it was at least this slow
+            endpoint.record_latency(time.perf_counter() - started)
+            raise
+        except Exception:
+            endpoint.record_failure()
+            raise
+        endpoint.record_success(time.perf_counter() - started)
+        return raw
+    
+    async def request(self, body: bytes, hedge: bool = True) -> bytes:
+        """Send one JSON-RPC payload (single or batch); returns the raw reply
+        
+        Fails fast with CircuitOpen while the pool as a whole is down.
+        """
+        with self.breaker.guard():
+            return await self.send(body, hedge)
+    
+    async def send(self, body: bytes, hedge: bool = True) -> bytes:
+        candidates = rank_endpoints(self.endpoints)
+        pending = set()
+        next_index = 0
+        last_error: Optional[BaseException] = None
+        
+        def launch():
+            nonlocal next_index
+            pending.add(asyncio.create_task(self.post(candidates[next_index], body)))
+            next_index += 1
+        
+        launch()
+        try:
+            while pending:
+                can_hedge = hedge and next_index < len(candidates)
+                timeout = candidates[next_index - 1].hedge_delay() if can_hedge else None
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                
+                if not done:
+                    self.hedged += 1
+                    launch()
+                    continue
+                
+                for task in done:
+                    pending.discard(task)
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                
+                if next_index < len(candidates):
+                    launch()  # fail over now, even while slower attempts are still pending
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def stats(self) -> dict:
+        return endpoint_stats(self.endpoints)
+
+class PooledAsyncHTTPProvider(AsyncJSONBaseProvider):
+    """AsyncWeb3 provider that sends every request through an RPCPool"""
+    
+    def __init__(self, pool: RPCPool, **kwargs):
+        super().__init__(**kwargs)
+        self.pool = pool
+    
+    async def make_request(self, method, params):
+        raw = await self.pool.request(
+            self.encode_rpc_request(method, params),
+            hedge=method not in NON_HEDGED_METHODS
+        )
+        return self.decode_rpc_response(raw)
+
+# ============================================
+# ANALYSIS CACHE
+# ============================================
+
+class AnalysisCache:
+    """Bounded LRU/TTL cache of analysis results, validated by wallet nonce"""
+    
+    def __init__(self, max_size: int = ANALYSIS_CACHE_SIZE, ttl: float = ANALYSIS_CACHE_DURATION):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # address -> (nonce, stored_at, result)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def get(self, address: str, nonce: int) -> Optional[dict]:
+        """Return cached result if present, fresh and the nonce is unchanged"""
+        entry = self._entries.get(address)
+        if entry is None:
+            self.misses += 1
+            return None
+        
+        cached_nonce, stored_at, result = entry
+        if cached_nonce != nonce or time.time() - stored_at > self.ttl:
+            del self._entries[address]
+            self.invalidations += 1
+            self.misses += 1
+            return None
+        
+        self._entries.move_to_end(address)
+        self.hits += 1
+        return copy.deepcopy(result)
+    
+    def put(self, address: str, nonce: int, result: dict):
+        """Store result, evicting least recently used entries over capacity"""
+        if self.max_size <= 0:
+            return
+        self._entries[address] = (nonce, time.time(), copy.deepcopy(result))
+        self._entries.move_to_end(address)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def stats(self) -> dict:
+        """Cache counters"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+class NegativeCache:
+    """Short-TTL cache of addresses rejected as invalid (locally or by Etherscan)"""
+    
+    def __init__(self, max_size: int = NEGATIVE_CACHE_SIZE, ttl: float = NEGATIVE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # address -> (expires_at, reason)
+        self.hits = 0
+    
+    def get(self, address: str) -> Optional[str]:
+        """Reason the address was rejected, if it still is"""
+        entry = self._entries.get(address.lower())
+        if entry is None:
+            return None
+        expires_at, reason = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[address.lower()]
+            return None
+        self.hits += 1
+        return reason
+    
+    def put(self, address: str, reason: str):
+        if self.max_size <= 0:
+            return
+        self._entries[address.lower()] = (time.monotonic() + self.ttl, reason)
+        self._entries.move_to_end(address.lower())
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def stats(self) -> dict:
+        return {'size': len(self._entries), 'ttl': self.ttl, 'hits': self.hits}
+
+# ============================================
+# TRANSACTION STORE
+# ============================================
+
+class TransactionStore:
+    """On-disk per-wallet transaction history (SQLite)"""
+    
+    def __init__(self, path: str = TX_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """Open the database on first use"""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS wallets (
+                    address TEXT PRIMARY KEY,
+                    last_block INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS tx_records (
+                    address TEXT NOT NULL,
+                    hash BLOB NOT NULL,
+                    block_number INTEGER NOT NULL,
+                    timestamp INTEGER NOT NULL,
+                    gas_used INTEGER NOT NULL,
+                    is_error INTEGER NOT NULL,
+                    to_address BLOB NOT NULL,
+                    PRIMARY KEY (address, block_number, hash)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS wallet_aggregates (
+                    address TEXT PRIMARY KEY,
+                    tx_count INTEGER NOT NULL,
+                    failed INTEGER NOT NULL,
+                    gas_used_sum INTEGER NOT NULL,
+                    label_counts BLOB NOT NULL,
+                    first_timestamp INTEGER,
+                    last_timestamp INTEGER,
+                    labels_version TEXT NOT NULL
+                );
+            """)
+            conn.commit()
+            self._migrate_json_transactions(conn)
+            self._conn = conn
+        return self._conn
+    
+    @staticmethod
+    def _migrate_json_transactions(conn: sqlite3.Connection):
+        """Convert stores written with raw Etherscan JSON rows to compact records"""
+        if not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions'"
+        ).fetchone():
+            return
+        cursor = conn.execute("SELECT address, tx_json FROM transactions")
+        while True:
+            rows = cursor.fetchmany(10000)
+            if not rows:
+                break
+            for address, group in itertools.groupby(rows, key=operator.itemgetter(0)):
+                records = TransactionRecords.from_etherscan([json.loads(row[1]) for row in group])
+                conn.executemany(
+                    "INSERT OR IGNORE INTO tx_records VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    records.rows(address)
+                )
+        conn.execute("DROP TABLE transactions")
+        conn.commit()
+    
+    def count_block(self, address: str, block_number: int) -> int:
+        """Rows stored for wallet in one block"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM tx_records WHERE address = ? AND block_number = ?",
+                (address.lower(), block_number)
+            ).fetchone()[0]
+    
+    def get_last_block(self, address: str) -> Optional[int]:
+        """Highest block seen for wallet, None if never fetched"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT last_block FROM wallets WHERE address = ?",
+                (address.lower(),)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def add_transactions(self, address: str, records: "TransactionRecords"):
+        """Insert new transactions, fold them into the wallet's aggregates
+        and advance its last block, in one SQLite transaction"""
+        if not len(records):
+            return
+        address = address.lower()
+        max_block = int(records.block_numbers.max())
+        with self._lock:
+            inserted = np.fromiter(
+                (
+                    self.conn.execute("INSERT OR IGNORE INTO tx_records VALUES (?, ?, ?, ?, ?, ?, ?)", row).rowcount == 1
+                    for row in records.rows(address)
+                ),
+                dtype=bool, count=len(records)
+            )
+            # Aggregates only ever absorb the delta; a missing or stale row is
+            # rebuilt from the stored history on the next read (under this lock,
+            # so no insert can land between the rebuild and its write)
+            stats = self._read_aggregates(address)
+            if stats is not None and inserted.any():
+                stats.add_records(records[inserted])
+                self._write_aggregates(address, stats)
+            self.conn.execute(
+                """INSERT INTO wallets VALUES (?, ?, ?)
+                   ON CONFLICT(address) DO UPDATE SET
+                       last_block = MAX(last_block, excluded.last_block),
+                       updated_at = excluded.updated_at""",
+                (address, max_block, time.time())
+            )
+            self.conn.commit()
+    
+    def load_aggregates(self, address: str) -> "TransactionStats":
+        """Persisted aggregates, rebuilt from the stored history when absent or stale
+        
+        The rebuild and its write hold the store lock throughout, so pages
+        stored concurrently are either counted by the rebuild or folded in
+        by add_transactions afterwards, never lost in between.
+        """
+        address = address.lower()
+        with self._lock:
+            stats = self._read_aggregates(address)
+            if stats is None:
+                stats = TransactionStats()
+                for records in self._iter_transactions(address):
+                    stats.add_records(records)
+                self._write_aggregates(address, stats)
+                self.conn.commit()
+            return stats
+    
+    def _read_aggregates(self, address: str) -> Optional["TransactionStats"]:
+        row = self.conn.execute(
+            """SELECT tx_count, failed, gas_used_sum, label_counts, first_timestamp,
+                      last_timestamp, labels_version
+               FROM wallet_aggregates WHERE address = ?""",
+            (address,)
+        ).fetchone()
+        # Label counts are only valid for the label index they were counted with
+        if row is None or row[6] != address_labels.version:
+            return None
+        stats = TransactionStats()
+        stats.count, stats.failed, stats.gas_used_sum = row[0], row[1], row[2]
+        stats.label_counts = np.frombuffer(row[3], dtype=np.int64).copy()
+        stats.first_timestamp, stats.last_timestamp = row[4], row[5]
+        return stats
+    
+    def _write_aggregates(self, address: str, stats: "TransactionStats"):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO wallet_aggregates VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                address, stats.count, stats.failed, stats.gas_used_sum,
+                stats.label_counts.astype(np.int64).tobytes(),
+                stats.first_timestamp, stats.last_timestamp, address_labels.version
+            )
+        )
+    
+    def _iter_transactions(self, address: str, page_size: int = ETHERSCAN_PAGE_SIZE) -> Iterator["TransactionRecords"]:
+        """Stream stored transactions oldest-first, one page at a time (caller holds the lock)"""
+        last_key = (-1, b"")
+        while True:
+            rows = self.conn.execute(
+                """SELECT hash, block_number, timestamp, gas_used, is_error, to_address
+                   FROM tx_records
+                   WHERE address = ? AND (block_number, hash) > (?, ?)
+                   ORDER BY block_number, hash LIMIT ?""",
+                (address, last_key[0], last_key[1], page_size)
+            ).fetchall()
+            if not rows:
+                return
+            yield TransactionRecords.from_rows(rows)
+            if len(rows) < page_size:
+                return
+            last_key = (rows[-1][1], rows[-1][0])
+    
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# ============================================
+# REQUEST SCHEDULER
+# ============================================
+
+class SchedulerQueueFull(Exception):
+    """Raised when the scheduler's wait queue is at capacity"""
+
+class EtherscanThrottled(Exception):
+    """Raised when Etherscan answers with a rate-limit error"""
+
+class EtherscanAddressError(Exception):
+    """Raised when Etherscan rejects the address itself"""
+
+class EtherscanError(Exception):
+    """Raised for other Etherscan errors (bad API key, query timeout, ...)"""
+
+class HistoryTruncated(Exception):
+    """Raised when a history walk stops at its page cap with rows left to fetch"""
+
+class RateLimitScheduler:
+    """Token bucket with a priority wait queue for outbound API calls"""
+    
+    def __init__(self, rate: float = ETHERSCAN_RATE_LIMIT, burst: int = ETHERSCAN_BURST,
+                 max_queue_depth: int = ETHERSCAN_MAX_QUEUE):
+        self.rate = rate
+        self.burst = burst
+        self.max_queue_depth = max_queue_depth
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.granted = 0
+        self.rejected = 0
+    
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE):
+        """Wait for a token; lower priority values are served first"""
+        self._refill()
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            self.granted += 1
+            return
+        
+        if len(self._waiters) >= self.max_queue_depth:
+            self.rejected += 1
+            raise SchedulerQueueFull(f"{len(self._waiters)} requests already queued")
+        
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+    
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+    
+    async def _dispatch(self):
+        """Release queued waiters in priority order as tokens become available"""
+        while self._waiters:
+            self._refill()
+            while self._waiters and self._tokens >= 1:
+                _, _, future = heapq.heappop(self._waiters)
+                if future.done():
+                    continue  # waiter was cancelled
+                self._tokens -= 1
+                self.granted += 1
+                future.set_result(None)
+            if self._waiters:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+    
+    def stats(self) -> dict:
+        return {
+            'queued': len(self._waiters),
+            'tokens': round(self._tokens, 2),
+            'granted': self.granted,
+            'rejected': self.rejected
+        }
+
+class AnalysisSlots:
+    """Concurrency limit for analyses, granted in priority order
+    
+    Non-interactive work is capped at bulk_limit slots, so a large batch
+    can't occupy every slot while interactive requests queue behind it.
+    """
+    
+    def __init__(self, limit: int = MAX_CONCURRENT_ANALYSES, bulk_limit: int = MAX_BULK_ANALYSES):
+        self.limit = limit
+        self.bulk_limit = min(bulk_limit, limit)
+        self.active = 0
+        self.active_bulk = 0
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self.timed_out = 0
+    
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = None):
+        """Hold one slot; raises asyncio.TimeoutError if none frees up within timeout"""
+        await self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self.release(priority)
+    
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = None):
+        self._prune()
+        if self._can_grant(priority) and (not self._waiters or self._waiters[0][0] > priority):
+            self._grant(priority)
+            return
+        
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                self.release(priority)  # granted just as the wait ended
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+            raise
+    
+    def release(self, priority: int = PRIORITY_INTERACTIVE):
+        self.active -= 1
+        if priority != PRIORITY_INTERACTIVE:
+            self.active_bulk -= 1
+        self._wake()
+    
+    def _can_grant(self, priority: int) -> bool:
+        if self.active >= self.limit:
+            return False
+        return priority == PRIORITY_INTERACTIVE or self.active_bulk < self.bulk_limit
+    
+    def _grant(self, priority: int):
+        self.active += 1
+        if priority != PRIORITY_INTERACTIVE:
+            self.active_bulk += 1
+    
+    def _prune(self):
+        """Drop waiters that timed out or were cancelled from the head of the queue"""
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+    
+    def _wake(self):
+        """Hand freed slots to queued waiters, best priority first"""
+        self._prune()
+        while self._waiters and self._can_grant(self._waiters[0][0]):
+            priority, _, future = heapq.heappop(self._waiters)
+            self._grant(priority)
+            future.set_result(None)
+            self._prune()
+    
+    def stats(self) -> dict:
+        return {
+            'active': self.active,
+            'active_bulk': self.active_bulk,
+            'queued': len(self._waiters),
+            'timed_out': self.timed_out
+        }
+
+# ============================================
+# CIRCUIT BREAKERS
+# ============================================
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker for one upstream
+    
+    After BREAKER_FAILURE_THRESHOLD consecutive failures the circuit opens
+    and calls fail immediately. After BREAKER_RESET_SECONDS it goes
+    half-open and lets BREAKER_HALF_OPEN_CALLS probes through: a success
+    closes it, a failure opens it again. A call cancelled by the caller's
+    deadline says nothing about the upstream and counts as neither; hanging
+    upstreams still trip the breaker through their request timeouts.
+    """
+    
+    CLOSED = 'closed'
+    HALF_OPEN = 'half_open'
+    OPEN = 'open'
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+    
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_SECONDS,
+                 half_open_calls: int = BREAKER_HALF_OPEN_CALLS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self._state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self.opened = 0
+        self.rejected = 0
+    
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self.probes = 0
+        return self._state
+    
+    def check(self):
+        """Fail fast while open, without taking a half-open probe slot"""
+        if self.state == self.OPEN:
+            self.rejected += 1
+            raise CircuitOpen(f"{self.name} circuit open")
+    
+    def allow(self):
+        """Admit one call or raise CircuitOpen"""
+        state = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self.probes >= self.half_open_calls):
+            self.rejected += 1
+            raise CircuitOpen(f"{self.name} circuit {state}")
+        if state == self.HALF_OPEN:
+            self.probes += 1
+    
+    def record_success(self):
+        self.failures = 0
+        if self._state != self.CLOSED:
+            self._state = self.CLOSED
+    
+    def record_failure(self):
+        if self._state == self.HALF_OPEN:
+            self._open()
+            return
+        self.failures += 1
+        if self._state == self.CLOSED and self.failures >= self.failure_threshold:
+            self._open()
+    
+    def _open(self):
+        self._state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.failures = 0
+        self.opened += 1
+    
+    @contextmanager
+    def guard(self):
+        """Admit a call and record how it ended"""
+        self.allow()
+        try:
+            yield
+        except asyncio.CancelledError:
+            self.release()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+    
+    def release(self):
+        """Give back a half-open probe slot for a call that never finished"""
+        if self._state == self.HALF_OPEN and self.probes > 0:
+            self.probes -= 1
+    
+    def stats(self) -> dict:
+        return {'state': self.state, 'opened': self.opened, 'rejected': self.rejected}
+
+# ============================================
+# ADDRESS LABEL INDEX
+# ============================================
+
+LABEL_NONE = 0
+LABEL_DEFI = 1
+LABEL_CEX = 2
+LABEL_BRIDGE = 3
+LABEL_MIXER = 4
+LABEL_SCAM = 5
+LABEL_NAMES = ('none', 'defi', 'cex', 'bridge', 'mixer', 'scam')
+
+def hex_to_keys(values, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert '0x'-prefixed hex strings to fixed-size byte keys; returns (keys, valid mask)"""
+    values = np.asarray(values, dtype=f'U{2 + 2 * size}')
+    valid = np.char.str_len(values) == 2 + 2 * size
+    keys = np.zeros(len(values), dtype=f'S{size}')
+    if valid.any():
+        try:
+            raw = bytes.fromhex(''.join(value[2:] for value in values[valid]))
+            keys[valid] = np.frombuffer(raw, dtype=f'S{size}')
+        except ValueError:
+            for i in np.flatnonzero(valid):
+                try:
+                    keys[i] = bytes.fromhex(values[i][2:])
+                except ValueError:
+                    valid[i] = False
+    return keys, valid
+
+def addresses_to_bytes(addresses: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Convert '0x'-prefixed hex addresses to 20-byte keys; returns (keys, valid mask)"""
+    return hex_to_keys(addresses, 20)
+
+class AddressLabelIndex:
+    """Sorted, memory-mapped address -> label index
+    
+    File layout: 8-byte magic, uint64 count, count sorted 20-byte addresses,
+    then count 1-byte labels. Lookups are binary searches over the mapped
+    pages, so one file on disk is shared read-only by every analyzer process.
+    """
+    
+    MAGIC = b'SYNLBL01'
+    HEADER_SIZE = 16
+    
+    def __init__(self, addresses: np.ndarray, labels: np.ndarray,
+                 fallback: Optional["AddressLabelIndex"] = None, version: str = "builtin"):
+        self.addresses = addresses
+        self.labels = labels
+        self.fallback = fallback
+        self.version = version  # identifies the label data behind persisted counts
+    
+    @classmethod
+    def from_pairs(cls, pairs, fallback: Optional["AddressLabelIndex"] = None) -> "AddressLabelIndex":
+        """In-memory index from (address, label) pairs; later duplicates win"""
+        addresses, labels = cls.sort_pairs(pairs)
+        return cls(addresses, labels, fallback)
+    
+    @classmethod
+    def open(cls, path: str, fallback: Optional["AddressLabelIndex"] = None) -> "AddressLabelIndex":
+        """Memory-map an index file built by build()"""
+        with open(path, 'rb') as f:
+            header = f.read(cls.HEADER_SIZE)
+        if len(header) != cls.HEADER_SIZE or header[:8] != cls.MAGIC:
+            raise ValueError(f"{path} is not an address label index")
+        count = int(np.frombuffer(header[8:], dtype='<u8')[0])
+        if count == 0:
+            return cls(np.zeros(0, dtype='S20'), np.zeros(0, dtype=np.uint8), fallback)
+        addresses = np.memmap(path, dtype='S20', mode='r', offset=cls.HEADER_SIZE, shape=(count,))
+        labels = np.memmap(path, dtype=np.uint8, mode='r', offset=cls.HEADER_SIZE + 20 * count, shape=(count,))
+        return cls(addresses, labels, fallback)
+    
+    @classmethod
+    def build(cls, pairs, path: str) -> int:
+        """Write an index file from (address, label) pairs; returns entry count"""
+        addresses, labels = cls.sort_pairs(pairs)
+        with open(path, 'wb') as f:
+            f.write(cls.MAGIC)
+            f.write(np.array([len(addresses)], dtype='<u8').tobytes())
+            f.write(addresses.tobytes())
+            f.write(labels.tobytes())
+        return len(addresses)
+    
+    @staticmethod
+    def sort_pairs(pairs) -> Tuple[np.ndarray, np.ndarray]:
+        pairs = list(pairs)
+        keys, valid = addresses_to_bytes([address.lower() for address, _ in pairs])
+        labels = np.array([label for _, label in pairs], dtype=np.uint8)
+        keys, labels = keys[valid], labels[valid]
+        # Stable sort, then keep the last entry of each run of equal keys
+        order = np.argsort(keys, kind='stable')
+        keys, labels = keys[order], labels[order]
+        last = np.ones(len(keys), dtype=bool)
+        last[:-1] = keys[:-1] != keys[1:]
+        return keys[last], labels[last]
+    
+    def __len__(self) -> int:
+        return len(self.addresses)
+    
+    def lookup(self, addresses: np.ndarray) -> np.ndarray:
+        """Labels for an array of '0x' addresses (LABEL_NONE when unknown)"""
+        keys, valid = addresses_to_bytes(addresses)
+        return self.lookup_keys(keys, valid)
+    
+    def lookup_keys(self, keys: np.ndarray, valid: np.ndarray) -> np.ndarray:
+        result = np.zeros(len(keys), dtype=np.uint8)
+        if len(self.addresses):
+            positions = np.searchsorted(self.addresses, keys)
+            positions = np.minimum(positions, len(self.addresses) - 1)
+            found = valid & (self.addresses[positions] == keys)
+            result[found] = self.labels[positions[found]]
+        if self.fallback is not None:
+            missing = valid & (result == LABEL_NONE)
+            if missing.any():
+                result[missing] = self.fallback.lookup_keys(keys[missing], valid[missing])
+        return result
+
+def load_address_labels() -> AddressLabelIndex:
+    """Label index from ADDRESS_LABELS_PATH, backed by the built-in DeFi routers"""
+    builtin = AddressLabelIndex.from_pairs((address, LABEL_DEFI) for address in DEFI_PROTOCOLS)
+    if not ADDRESS_LABELS_PATH:
+        return builtin
+    index = AddressLabelIndex.open(ADDRESS_LABELS_PATH, fallback=builtin)
+    stat = os.stat(ADDRESS_LABELS_PATH)
+    index.version = f"{os.path.abspath(ADDRESS_LABELS_PATH)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return index
+
+address_labels = load_address_labels()
+
+# ============================================
+# TRANSACTION STATISTICS
+# ============================================
+
+def parse_int_column(transactions: List[dict], field: str) -> np.ndarray:
+    """Parse a decimal-string field into int64, treating bad values as 0"""
+    values = [tx.get(field) or '0' for tx in transactions]
+    try:
+        return np.array(values, dtype=np.int64)
+    except (TypeError, ValueError, OverflowError):
+        def to_int(value):
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                return 0
+        return np.fromiter((to_int(v) for v in values), dtype=np.int64, count=len(values))
+
+class TransactionRecords:
+    """Compact columnar transaction records, parsed once at ingestion
+    
+    Keeps only what scoring and the store need: 32-byte hashes, 20-byte
+    counterparties and integer columns, about 80 bytes per transaction
+    instead of a ~20-field Etherscan dict of strings.
+    """
+    
+    __slots__ = ('hashes', 'block_numbers', 'timestamps', 'gas_used', 'is_error', 'to_keys')
+    
+    def __init__(self, hashes: np.ndarray, block_numbers: np.ndarray, timestamps: np.ndarray,
+                 gas_used: np.ndarray, is_error: np.ndarray, to_keys: np.ndarray):
+        self.hashes = hashes
+        self.block_numbers = block_numbers
+        self.timestamps = timestamps
+        self.gas_used = gas_used
+        self.is_error = is_error
+        self.to_keys = to_keys  # all-zero for contract creations
+    
+    @classmethod
+    def from_etherscan(cls, transactions: List[dict]) -> "TransactionRecords":
+        """Parse a page of Etherscan rows; the dicts can be dropped afterwards"""
+        hashes, _ = hex_to_keys([tx.get('hash') or '' for tx in transactions], 32)
+        to_keys, _ = addresses_to_bytes([tx.get('to') or '' for tx in transactions])
+        return cls(
+            hashes,
+            parse_int_column(transactions, 'blockNumber'),
+            parse_int_column(transactions, 'timeStamp'),
+            parse_int_column(transactions, 'gasUsed'),
+            np.array([tx.get('isError') == '1' for tx in transactions], dtype=bool),
+            to_keys
+        )
+    
+    @classmethod
+    def from_rows(cls, rows: List[tuple]) -> "TransactionRecords":
+        """Records from (hash, block_number, timestamp, gas_used, is_error, to_address) rows"""
+        if not rows:
+            return cls.empty()
+        hashes, block_numbers, timestamps, gas_used, is_error, to_keys = zip(*rows)
+        return cls(
+            np.array(hashes, dtype='S32'),
+            np.array(block_numbers, dtype=np.int64),
+            np.array(timestamps, dtype=np.int64),
+            np.array(gas_used, dtype=np.int64),
+            np.array(is_error, dtype=bool),
+            np.array(to_keys, dtype='S20')
+        )
+    
+    @classmethod
+    def empty(cls) -> "TransactionRecords":
+        return cls.from_etherscan([])
+    
+    def __len__(self) -> int:
+        return len(self.timestamps)
+    
+    def __getitem__(self, selection) -> "TransactionRecords":
+        """Subset by index array or boolean mask"""
+        return TransactionRecords(*(getattr(self, name)[selection] for name in self.__slots__))
+    
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.__slots__)
+    
+    def rows(self, address: str) -> Iterator[tuple]:
+        """Store rows for this wallet"""
+        return zip(
+            itertools.repeat(address),
+            map(bytes, self.hashes.astype('V32')),
+            self.block_numbers.tolist(),
+            self.timestamps.tolist(),
+            self.gas_used.tolist(),
+            self.is_error.astype(int).tolist(),
+            map(bytes, self.to_keys.astype('V20'))
+        )
+    
+    def label_counts(self, index: AddressLabelIndex) -> np.ndarray:
+        """Number of rows sent to counterparties of each label"""
+        if len(self) == 0:
+            return np.zeros(len(LABEL_NAMES), dtype=np.int64)
+        # Look up each distinct counterparty once
+        to_keys, to_ids = np.unique(self.to_keys, return_inverse=True)
+        per_address = np.bincount(to_ids.ravel(), minlength=len(to_keys))
+        labels = index.lookup_keys(to_keys, to_keys != b'')
+        return np.bincount(labels, weights=per_address, minlength=len(LABEL_NAMES)).astype(np.int64)
+
+class TransactionStats:
+    """Running aggregates over a wallet's history, fed one page at a time"""
+    
+    def __init__(self):
+        self.count = 0
+        self.failed = 0
+        self.gas_used_sum = 0
+        self.label_counts = np.zeros(len(LABEL_NAMES), dtype=np.int64)
+        self.first_timestamp: Optional[int] = None
+        self.last_timestamp: Optional[int] = None
+    
+    @classmethod
+    def from_transactions(cls, transactions: List[dict]) -> "TransactionStats":
+        stats = cls()
+        stats.add_page(transactions)
+        return stats
+    
+    def add_page(self, transactions: List[dict]):
+        if transactions:
+            self.add_records(TransactionRecords.from_etherscan(transactions))
+    
+    def add_records(self, records: TransactionRecords):
+        """Fold one page into the aggregates with vectorized reductions"""
+        if len(records) == 0:
+            return
+        self.count += len(records)
+        self.failed += int(records.is_error.sum())
+        self.gas_used_sum += int(records.gas_used.sum())
+        self.label_counts += records.label_counts(address_labels)
+        
+        timestamps = records.timestamps[records.timestamps > 0]
+        if len(timestamps):
+            first, last = int(timestamps.min()), int(timestamps.max())
+            if self.first_timestamp is None or first < self.first_timestamp:
+                self.first_timestamp = first
+            if self.last_timestamp is None or last > self.last_timestamp:
+                self.last_timestamp = last
+    
+    @property
+    def time_span_days(self) -> float:
+        if self.first_timestamp is None:
+            return 0.0
+        return (self.last_timestamp - self.first_timestamp) / 86400
+    
+    @property
+    def avg_gas_used(self) -> float:
+        return self.gas_used_sum / self.count if self.count else 0.0
+    
+    @property
+    def defi_interactions(self) -> int:
+        return int(self.label_counts[LABEL_DEFI])
+    
+    @property
+    def cex_interactions(self) -> int:
+        return int(self.label_counts[LABEL_CEX])
+    
+    @property
+    def bridge_interactions(self) -> int:
+        return int(self.label_counts[LABEL_BRIDGE])
+    
+    @property
+    def mixer_interactions(self) -> int:
+        return int(self.label_counts[LABEL_MIXER])
+    
+    @property
+    def scam_interactions(self) -> int:
+        return int(self.label_counts[LABEL_SCAM])
+
+# ============================================
+# METTA RULE ENGINE
+# ============================================
+
+# Features every rule may reference; computed once per analysis
+RULE_FEATURES = (
+    'base_score', 'balance', 'tx_count', 'history_count', 'failed_count',
+    'avg_gas_used', 'defi_interactions', 'cex_interactions', 'bridge_interactions',
+    'mixer_interactions', 'scam_interactions', 'time_span_days', 'wallet_age_days'
+)
+# Features that are floats at runtime (the rest are ints); templates are validated with matching types
+FLOAT_RULE_FEATURES = {'base_score', 'balance', 'avg_gas_used', 'time_span_days'}
+
+RULE_OPERATORS = {
+    '>': operator.gt, '>=': operator.ge, '<': operator.lt,
+    '<=': operator.le, '==': operator.eq, '!=': operator.ne
+}
+
+# Each rule: id, conditions (all must hold), adjustment, explanation template
+DEFAULT_METTA_RULES = [
+    {
+        'id': 'HIGH_BALANCE_TRUST',
+        'when': [['balance', '>', 1.0]],
+        'adjustment': 5,
+        'explanation': 'Wallet holds {balance:.2f} ETH, indicating financial commitment'
+    },
+    {
+        'id': 'MODERATE_BALANCE',
+        'when': [['balance', '>', 0.1], ['balance', '<=', 1.0]],
+        'adjustment': 2,
+        'explanation': 'Wallet has active balance of {balance:.2f} ETH'
+    },
+    {
+        'id': 'VETERAN_USER',
+        'when': [['tx_count', '>', 100]],
+        'adjustment': 3,
+        'explanation': 'Extensive history with {tx_count} transactions shows long-term engagement'
+    },
+    {
+        'id': 'LONG_TERM_HOLDER',
+        'when': [['history_count', '>', 20], ['time_span_days', '>', 365]],
+        'adjustment': 4,
+        'explanation': 'Active for over 1 year, demonstrating stability'
+    },
+    {
+        'id': 'NEW_WALLET_DISCOUNT',
+        'when': [['tx_count', '<', 5]],
+        'adjustment': -3,
+        'explanation': 'Limited transaction history reduces confidence'
+    },
+    {
+        'id': 'INACTIVE_WALLET',
+        'when': [['balance', '==', 0], ['tx_count', '<', 10]],
+        'adjustment': -5,
+        'explanation': 'Wallet appears inactive with no balance'
+    },
+]
+
+class RuleEngine:
+    """Declarative reasoning rules compiled into one vectorized evaluation plan
+    
+    Every condition of every rule becomes a row in flat arrays (feature index,
+    operator, threshold, owning rule). Evaluation compares all rows at once per
+    operator and counts satisfied conditions per rule, so cost grows with the
+    number of conditions in C rather than in Python.
+    """
+    
+    def __init__(self, path: str = METTA_RULES_PATH):
+        self.path = path
+        self.loaded_mtime: Optional[float] = None
+        self.compile(self.load_rules())
+    
+    def load_rules(self) -> List[dict]:
+        if not self.path:
+            return DEFAULT_METTA_RULES
+        self.loaded_mtime = os.path.getmtime(self.path)
+        with open(self.path) as f:
+            return json.load(f)
+    
+    def compile(self, rules: List[dict]):
+        """Validate rules and build the evaluation plan; raises ValueError"""
+        feature_index = {name: i for i, name in enumerate(RULE_FEATURES)}
+        sample_features = {name: 0.0 if name in FLOAT_RULE_FEATURES else 0 for name in RULE_FEATURES}
+        
+        rule_ids, adjustments, templates, conditions_per_rule = [], [], [], []
+        cond_feature, cond_op, cond_threshold, cond_rule = [], [], [], []
+        
+        for rule_index, rule in enumerate(rules):
+            rule_id = rule['id']
+            conditions = rule.get('when', [])
+            for feature, op, threshold in conditions:
+                if feature not in feature_index:
+                    raise ValueError(f"{rule_id}: unknown feature '{feature}'")
+                if op not in RULE_OPERATORS:
+                    raise ValueError(f"{rule_id}: unknown operator '{op}'")
+                cond_feature.append(feature_index[feature])
+                cond_op.append(op)
+                cond_threshold.append(float(threshold))
+                cond_rule.append(rule_index)
+            rule['explanation'].format(**sample_features)  # fail early on bad templates
+            rule_ids.append(rule_id)
+            adjustments.append(int(rule['adjustment']))
+            templates.append(rule['explanation'])
+            conditions_per_rule.append(len(conditions))
+        
+        cond_op = np.array(cond_op, dtype=object)
+        
+        # Swap in the new plan only once everything validated
+        self.rule_ids = rule_ids
+        self.templates = templates
+        self.adjustments = np.array(adjustments, dtype=np.int64)
+        self.conditions_per_rule = np.array(conditions_per_rule, dtype=np.int64)
+        self.cond_feature = np.array(cond_feature, dtype=np.int64)
+        self.cond_threshold = np.array(cond_threshold, dtype=np.float64)
+        self.cond_rule = np.array(cond_rule, dtype=np.int64)
+        self.op_groups = [
+            (RULE_OPERATORS[op], np.flatnonzero(cond_op == op))
+            for op in RULE_OPERATORS if (cond_op == op).any()
+        ]
+    
+    def reload_if_changed(self) -> bool:
+        """Recompile from disk if the rules file changed; keeps old plan on error"""
+        if not self.path:
+            return False
+        try:
+            if os.path.getmtime(self.path) == self.loaded_mtime:
+                return False
+            self.compile(self.load_rules())
+            return True
+        except (OSError, ValueError, KeyError, TypeError, IndexError) as e:
+            raise ValueError(f"Rules not reloaded: {e}") from e
+    
+    def evaluate(self, features: dict) -> dict:
+        """Apply all rules to one wallet's features"""
+        values = np.array([float(features[name]) for name in RULE_FEATURES])
+        
+        satisfied = np.zeros(len(self.cond_feature), dtype=bool)
+        operands = values[self.cond_feature]
+        for compare, rows in self.op_groups:
+            satisfied[rows] = compare(operands[rows], self.cond_threshold[rows])
+        satisfied &= ~np.isnan(operands)  # a missing (NaN) feature satisfies no condition, not even '!='
+        
+        satisfied_per_rule = np.bincount(
+            self.cond_rule, weights=satisfied, minlength=len(self.rule_ids)
+        )
+        fired = np.flatnonzero(satisfied_per_rule == self.conditions_per_rule)
+        
+        explanations = [self.templates[i].format(**features) for i in fired]
+        return {
+            'adjustments': int(self.adjustments[fired].sum()),
+            'rules_applied': [self.rule_ids[i] for i in fired],
+            'explanation': " ".join(explanations) if explanations else "Standard reputation analysis applied"
+        }
 
 # ============================================
 # ANALYSIS ENGINE
@@ -62,117 +1376,490 @@ class WalletAnalyzer:
     def __init__(self):
         self.etherscan_api = ETHERSCAN_API_KEY
         self.agent_id = "wallet_analyzer_v1"
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.breakers = {'rpc': CircuitBreaker('rpc'), 'etherscan': CircuitBreaker('etherscan')}
+        self.rpc_pool = RPCPool(ETH_RPC_URLS, self.get_session, self.breakers['rpc'])
+        self.w3 = AsyncWeb3(PooledAsyncHTTPProvider(self.rpc_pool))
+        self.cache = AnalysisCache()
+        self.negative_cache = NegativeCache()
+        self.tx_store = TransactionStore()
+        self.etherscan_scheduler = RateLimitScheduler()
+        self.analysis_slots = AnalysisSlots()
+        self.in_flight: Dict[str, asyncio.Task] = {}
+        self.coalesced = 0
+        self.rule_engine = RuleEngine()
+    
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Shared keep-alive session for the RPC pool and Etherscan"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=HTTP_POOL_SIZE, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT_SECONDS)
+            )
+        return self._session
+    
+    async def close(self):
+        """Close the shared HTTP session"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self.tx_store.close()
+    
+    async def analyze_wallet(self, ctx: Context, wallet_address: str,
+                             balance: Optional[float] = None,
+                             tx_count: Optional[int] = None,
+                             priority: int = PRIORITY_INTERACTIVE,
+                             deadline: Optional[float] = None) -> dict:
+        """Main analysis function
+        
+        Concurrent calls for the same wallet share one fetch + scoring run;
+        each caller receives its own copy of the result. deadline is a
+        time.monotonic() value shared by every stage of the run. A caller
+        joining a run that started with a later deadline or lower priority
+        waits only until its own deadline, then scores from stored data.
+        """
+        
+        key = wallet_address.lower()
+        reason = self.negative_cache.get(key)
+        if reason:
+            ctx.logger.info(f"⛔ Negative cache hit ({reason}): {wallet_address}")
+            return self.get_default_analysis(wallet_address)
+        
+        task = self.in_flight.get(key)
+        
+        if task is None:
+            task = asyncio.create_task(
+                self.run_analysis(ctx, wallet_address, balance, tx_count, priority, deadline)
+            )
+            self.in_flight[key] = task
+            task.add_done_callback(
+                lambda done: self.in_flight.pop(key) if self.in_flight.get(key) is done else None
+            )
+        else:
+            self.coalesced += 1
+            ctx.logger.info(f"🔗 Joined in-flight analysis: {wallet_address}")
+            if deadline is not None:
+                wait = max(0.0, deadline - time.monotonic() - SCORING_RESERVE_SECONDS)
+                try:
+                    return copy.deepcopy(await asyncio.wait_for(asyncio.shield(task), wait))
+                except asyncio.TimeoutError:
+                    # Leave the shared run going; answer this caller from what's stored
+                    ctx.logger.warning(f"⏱️ In-flight analysis outlasted this request's deadline: {wallet_address}")
+                    return await self.score_wallet(ctx, wallet_address, balance, tx_count, priority, time.monotonic())
+        
+        # Shield so one caller's cancellation doesn't cancel the shared run
+        return copy.deepcopy(await asyncio.shield(task))
     
-    async def analyze_wallet(self, ctx: Context, wallet_address: str) -> dict:
-        """Main analysis function"""
+    async def run_analysis(self, ctx: Context, wallet_address: str,
+                           balance: Optional[float] = None,
+                           tx_count: Optional[int] = None,
+                           priority: int = PRIORITY_INTERACTIVE,
+                           deadline: Optional[float] = None) -> dict:
+        """Single analysis run, bounded by MAX_CONCURRENT_ANALYSES
+        
+        Slots go to higher priorities first. A run that can't get one
+        before its deadline is scored from stored data without fetching.
+        """
+        wait = None if deadline is None else max(0.0, deadline - time.monotonic() - SCORING_RESERVE_SECONDS)
+        try:
+            async with self.analysis_slots.slot(priority, wait):
+                with timed_stage('total'):
+                    return await self.score_wallet(ctx, wallet_address, balance, tx_count, priority, deadline)
+        except asyncio.TimeoutError:
+            ctx.logger.warning(f"⏱️ No analysis slot before the deadline: {wallet_address}")
+            return await self.score_wallet(ctx, wallet_address, balance, tx_count, priority, time.monotonic())
+    
+    async def score_wallet(self, ctx: Context, wallet_address: str,
+                           balance: Optional[float] = None,
+                           tx_count: Optional[int] = None,
+                           priority: int = PRIORITY_INTERACTIVE,
+                           deadline: Optional[float] = None) -> dict:
+        """Fetch wallet data and compute scores
+        
+        balance / tx_count may be prefetched (e.g. by a JSON-RPC batch);
+        missing values are fetched here. priority orders Etherscan calls.
+        Each fetch stage gets a share of the time left before deadline; a
+        source that fails or runs out of budget is left out, and the result
+        is scored from the rest and flagged partial in analysis_data.
+        """
         
         ctx.logger.info(f"🔍 Analyzing wallet: {wallet_address}")
         
+        def stage_budget(limit: float = float('inf')) -> float:
+            if deadline is None:
+                return limit
+            return min(limit, deadline - time.monotonic() - SCORING_RESERVE_SECONDS)
+        
+        if not Web3.is_address(wallet_address):
+            ctx.logger.warning(f"⚠️ Invalid address: {wallet_address}")
+            self.negative_cache.put(wallet_address, 'invalid address')
+            return self.get_default_analysis(wallet_address)
+        
         try:
-            # Fetch wallet data
-            balance = self.get_eth_balance(wallet_address)
-            tx_count = self.get_transaction_count(wallet_address)
-            transactions = self.get_recent_transactions(wallet_address)
-            
-            ctx.logger.info(f"   Balance: {balance} ETH")
-            ctx.logger.info(f"   Transactions: {tx_count}")
+            checksum_address = Web3.to_checksum_address(wallet_address)
+            await self.get_session()
+            missing = []
             
-            # Calculate component scores
-            transaction_score = self.calculate_transaction_score(tx_count, transactions)
-            defi_score = self.calculate_defi_score(transactions)
-            security_score = self.calculate_security_score(wallet_address, transactions)
-            social_score = self.calculate_social_score(wallet_address)
+            # Nonce check first: unchanged wallets are served from cache
+            if tx_count is None:
+                tx_count = await self.fetch_within(
+                    'rpc', self.get_transaction_count(wallet_address), stage_budget(RPC_STAGE_BUDGET_SECONDS)
+                )
+            if tx_count is not None:
+                cached = self.cache.get(checksum_address, tx_count)
+                if cached:
+                    ctx.logger.info(f"⚡ Cache hit: {cached['score']}/100 (nonce {tx_count})")
+                    return cached
             
-            # Base score (weighted average out of 100)
-            base_score = (
-                transaction_score * 0.30 +
-                defi_score * 0.25 +
-                security_score * 0.30 +
-                social_score * 0.15
-            )
+            # Fetch remaining wallet data concurrently
+            if balance is None:
+                balance, (transactions, history_complete) = await asyncio.gather(
+                    self.fetch_within('rpc', self.get_eth_balance(wallet_address), stage_budget(RPC_STAGE_BUDGET_SECONDS)),
+                    self.get_transaction_stats(wallet_address, priority, stage_budget())
+                )
+            else:
+                transactions, history_complete = await self.get_transaction_stats(
+                    wallet_address, priority, stage_budget()
+                )
             
-            # Apply MeTTa reasoning rules
-            metta_result = self.apply_metta_reasoning(
-                base_score, 
-                balance, 
-                tx_count,
-                transactions
-            )
+            # Score from whatever arrived
+            if balance is None:
+                missing.append('balance')
+                balance = float('nan')  # balance rules neither fire nor count it as empty
+            if tx_count is None:
+                missing.append('nonce')
+                tx_count = transactions.count
+            if not history_complete:
+                missing.append('history')
             
-            # Final score out of 100
-            final_score = int(min(100, max(0, base_score + metta_result['adjustments'])))
+            ctx.logger.info(f"   Balance: {balance} ETH")
+            ctx.logger.info(f"   Transactions: {tx_count} ({transactions.count} in history)")
             
-            # Determine reputation level
-            reputation_level = self.get_reputation_level(final_score)
+            scoring_started = time.perf_counter()
+            result = self.compute_scores(wallet_address, balance, tx_count, transactions)
+            STAGE_SECONDS.labels('scoring').observe(time.perf_counter() - scoring_started)
             
-            ctx.logger.info(f"✅ Analysis complete: {final_score}/100 ({reputation_level})")
+            result['analysis_data']['partial'] = bool(missing)
+            result['analysis_data']['missing_sources'] = missing
             
-            return {
-                'score': final_score,
-                'transaction_score': transaction_score,
-                'defi_score': defi_score,
-                'security_score': security_score,
-                'social_score': social_score,
-                'reputation_level': reputation_level,
-                'reasoning_explanation': metta_result['explanation'],
-                'metta_rules_applied': metta_result['rules_applied'],
-                'score_adjustments': metta_result['adjustments'],
-                'analysis_data': {
-                    'balance': str(balance),
-                    'tx_count': tx_count,
-                    'has_defi': defi_score > 0,
-                    'wallet_age_days': self.estimate_wallet_age(transactions)
-                }
-            }
+            if missing:
+                for source in missing:
+                    PARTIAL.labels(source).inc()
+                ctx.logger.warning(f"⚠️ Partial analysis without {', '.join(missing)}: {result['score']}/100")
+            else:
+                ctx.logger.info(f"✅ Analysis complete: {result['score']}/100 ({result['reputation_level']})")
+                # Partial results aren't cached so the next request retries the missing sources
+                self.cache.put(checksum_address, tx_count, result)
+            return result
             
         except Exception as e:
-            ctx.logger.error(f"❌ Analysis error: {str(e)}")
+            cause = record_error('analysis', e)
+            ctx.logger.error(f"❌ Analysis error ({cause}): {str(e)}")
+            # Not negatively cached: bad addresses are cached where they're detected
             return self.get_default_analysis(wallet_address)
     
-    def get_eth_balance(self, address: str) -> float:
-        """Get ETH balance"""
+    def compute_scores(self, wallet_address: str, balance: float, tx_count: int,
+                       transactions: TransactionStats) -> dict:
+        """Component scores, MeTTa reasoning and final score from fetched wallet data"""
+        
+        # Calculate component scores
+        transaction_score = self.calculate_transaction_score(tx_count, transactions)
+        defi_score = self.calculate_defi_score(transactions)
+        security_score = self.calculate_security_score(wallet_address, transactions)
+        social_score = self.calculate_social_score(wallet_address)
+        
+        # Base score (weighted average out of 100)
+        base_score = (
+            transaction_score * 0.30 +
+            defi_score * 0.25 +
+            security_score * 0.30 +
+            social_score * 0.15
+        )
+        
+        # Apply MeTTa reasoning rules
+        metta_result = self.apply_metta_reasoning(
+            base_score, 
+            balance, 
+            tx_count,
+            transactions
+        )
+        
+        # Final score out of 100
+        final_score = int(min(100, max(0, base_score + metta_result['adjustments'])))
+        
+        # Determine reputation level
+        reputation_level = self.get_reputation_level(final_score)
+        
+        return {
+            'score': final_score,
+            'transaction_score': transaction_score,
+            'defi_score': defi_score,
+            'security_score': security_score,
+            'social_score': social_score,
+            'reputation_level': reputation_level,
+            'reasoning_explanation': metta_result['explanation'],
+            'metta_rules_applied': metta_result['rules_applied'],
+            'score_adjustments': metta_result['adjustments'],
+            'analysis_data': {
+                'balance': None if np.isnan(balance) else str(balance),
+                'tx_count': tx_count,
+                'has_defi': defi_score > 0,
+                'wallet_age_days': self.estimate_wallet_age(transactions)
+            }
+        }
+    
+    async def fetch_within(self, source: str, fetch, budget: float):
+        """Await one fetch stage within its budget; None if it fails or runs out
+        
+        A stage with no budget left is skipped without counting an error,
+        since no call was made.
+        """
+        if budget <= 0:
+            fetch.close()
+            return None
         try:
-            balance_wei = w3.eth.get_balance(Web3.to_checksum_address(address))
-            return float(w3.from_wei(balance_wei, 'ether'))
-        except:
-            return 0.0
+            return await asyncio.wait_for(fetch, None if budget == float('inf') else budget)
+        except Exception as e:
+            record_error(source, e)
+            return None
+    
+    async def get_eth_balance(self, address: str) -> float:
+        """Get ETH balance"""
+        with timed_stage('rpc_balance'):
+            balance_wei = await self.w3.eth.get_balance(Web3.to_checksum_address(address))
+        return float(Web3.from_wei(balance_wei, 'ether'))
     
-    def get_transaction_count(self, address: str) -> int:
+    async def get_transaction_count(self, address: str) -> int:
         """Get total transaction count"""
-        try:
-            return w3.eth.get_transaction_count(Web3.to_checksum_address(address))
-        except:
-            return 0
+        with timed_stage('rpc_nonce'):
+            return await self.w3.eth.get_transaction_count(Web3.to_checksum_address(address))
+    
+    async def rpc_batch(self, calls: List[Tuple[str, list]]) -> list:
+        """Send (method, params) calls as JSON-RPC batches; failed calls yield None"""
+        results = [None] * len(calls)
+        
+        async def send_chunk(offset: int):
+            payload = [
+                {'jsonrpc': '2.0', 'id': offset + i, 'method': method, 'params': params}
+                for i, (method, params) in enumerate(calls[offset:offset + RPC_BATCH_SIZE])
+            ]
+            with timed_stage('rpc_batch'):
+                replies = json.loads(await self.rpc_pool.request(json.dumps(payload).encode()))
+            if not isinstance(replies, list):
+                raise ValueError(f"batch rejected: {str(replies)[:100]}")
+            for reply in replies:
+                if 'result' in reply and isinstance(reply.get('id'), int):
+                    results[reply['id']] = reply['result']
+        
+        outcomes = await asyncio.gather(
+            *(send_chunk(offset) for offset in range(0, len(calls), RPC_BATCH_SIZE)),
+            return_exceptions=True
+        )
+        for outcome in outcomes:
+            if isinstance(outcome, Exception):
+                record_error('rpc', outcome)
+        return results
+    
+    async def get_balances_and_nonces(self, addresses: List[str]) -> Dict[str, Tuple[Optional[float], Optional[int]]]:
+        """Balances and nonces for many wallets in one JSON-RPC batch"""
+        calls = []
+        for address in addresses:
+            calls.append(('eth_getBalance', [address, 'latest']))
+            calls.append(('eth_getTransactionCount', [address, 'latest']))
+        
+        results = await self.rpc_batch(calls)
+        
+        wallet_data = {}
+        for i, address in enumerate(addresses):
+            balance_hex, nonce_hex = results[2 * i], results[2 * i + 1]
+            balance = float(Web3.from_wei(int(balance_hex, 16), 'ether')) if balance_hex else None
+            nonce = int(nonce_hex, 16) if nonce_hex else None
+            wallet_data[address] = (balance, nonce)
+        return wallet_data
     
-    def get_recent_transactions(self, address: str, limit: int = 100) -> List[dict]:
-        """Fetch recent transactions from Etherscan"""
+    async def get_transaction_stats(self, address: str, priority: int = PRIORITY_INTERACTIVE,
+                                    budget: float = float('inf')) -> Tuple[TransactionStats, bool]:
+        """Sync new history into the local store and read the wallet's aggregates
+        
+        New pages are folded into the persisted aggregates as they are stored,
+        so re-scoring an active wallet costs only its new transactions. When
+        the sync fails, runs past budget or hits the page cap, the pages
+        stored so far are still used; the flag returned alongside says
+        whether the history is complete.
+        """
         if not self.etherscan_api:
-            return []
+            return TransactionStats(), True
+        
+        complete = await self.fetch_within(
+            'history_sync', self.sync_transactions(address, priority), budget
+        ) is not None
         
         try:
-            url = f"https://api.etherscan.io/api"
-            params = {
-                'module': 'account',
-                'action': 'txlist',
-                'address': address,
-                'startblock': 0,
-                'endblock': 99999999,
-                'page': 1,
-                'offset': limit,
-                'sort': 'desc',
-                'apikey': self.etherscan_api
-            }
+            with timed_stage('store_read'):
+                return await asyncio.to_thread(self.load_transaction_stats, address), complete
+        except Exception as e:
+            record_error('store', e)
+            return TransactionStats(), False
+    
+    async def sync_transactions(self, address: str, priority: int = PRIORITY_INTERACTIVE) -> int:
+        """Download blocks newer than the local store, page by page; returns rows fetched
+        
+        Resumes at the last stored block itself, not the one after it: a
+        sync cut short by the page cap or the deadline may have stored only
+        part of that block. Rows already stored are ignored on insert. A
+        block holding more than a page resumes at the page it stopped in.
+        """
+        page_size = ETHERSCAN_PAGE_SIZE
+        last_block = await asyncio.to_thread(self.tx_store.get_last_block, address)
+        start_block, start_page = 0, 1
+        if last_block is not None:
+            start_block = last_block
+            stored = await asyncio.to_thread(self.tx_store.count_block, address, last_block)
+            start_page = stored // page_size + 1 if stored >= page_size else 1
+        fetched = 0
+        
+        try:
+            async for page in self.iter_etherscan_pages(
+                address, 'txlist', start_block, page_size=page_size,
+                priority=priority, start_page=start_page
+            ):
+                records = TransactionRecords.from_etherscan(page)
+                del page  # only the compact records are kept
+                with timed_stage('store_write'):
+                    await asyncio.to_thread(self.tx_store.add_transactions, address, records)
+                fetched += len(records)
+        except EtherscanAddressError as e:
+            # Asking again won't help; don't re-fetch this address for a while
+            self.negative_cache.put(address, f"etherscan: {str(e)}")
+            raise
+        return fetched
+    
+    def load_transaction_stats(self, address: str) -> TransactionStats:
+        """Persisted aggregates, rebuilt from the stored history when absent or stale"""
+        return self.tx_store.load_aggregates(address)
+    
+    async def iter_etherscan_pages(self, address: str, action: str = 'txlist',
+                                   start_block: int = 0,
+                                   page_size: int = ETHERSCAN_PAGE_SIZE,
+                                   max_pages: int = TX_HISTORY_MAX_PAGES,
+                                   priority: int = PRIORITY_INTERACTIVE,
+                                   start_page: int = 1) -> AsyncIterator[List[dict]]:
+        """Stream account history oldest-first (txlist, txlistinternal, tokentx)
+        
+        Walks by block range rather than page number, so histories beyond
+        Etherscan's 10000-row window are reachable. Rows of the boundary
+        block are re-requested and de-duplicated. A block that fills a whole
+        page is paged through by number before moving past it; start_page > 1
+        resumes inside such a block. Raises HistoryTruncated after the pages
+        it did yield when max_pages runs out before the history does.
+        """
+        boundary_keys = set()
+        block_page = start_page  # > 1 while paging through a single oversized block
+        for _ in range(max_pages):
+            if block_page > 1:
+                page = await self.fetch_etherscan_page(
+                    address, action, start_block, page_size, priority,
+                    end_block=start_block, page_number=block_page
+                )
+            else:
+                page = await self.fetch_etherscan_page(address, action, start_block, page_size, priority)
+            fresh = [tx for tx in page if self.tx_key(tx) not in boundary_keys]
+            if fresh:
+                yield fresh
             
-            response = requests.get(url, params=params, timeout=10)
-            data = response.json()
+            if block_page > 1:
+                if len(page) < page_size:
+                    start_block, block_page = start_block + 1, 1
+                else:
+                    block_page += 1
+                continue
+            if len(page) < page_size:
+                return
+            
+            last_block = int(page[-1]['blockNumber'])
+            if last_block == start_block:
+                # A single block fills the page; continue through it page by page
+                block_page, boundary_keys = 2, set()
+            else:
+                start_block = last_block
+                boundary_keys = {self.tx_key(tx) for tx in page if int(tx['blockNumber']) == last_block}
+        raise HistoryTruncated(f"{action} for {address} stopped after {max_pages} pages at block {start_block}")
+    
+    @staticmethod
+    def tx_key(tx: dict) -> str:
+        """Unique row key (internal/token rows share their parent tx hash)"""
+        return f"{tx.get('hash')}:{tx.get('traceId', '')}:{tx.get('logIndex', '')}"
+    
+    async def fetch_etherscan_page(self, address: str, action: str, start_block: int,
+                                   page_size: int, priority: int = PRIORITY_INTERACTIVE,
+                                   end_block: int = 99999999, page_number: int = 1) -> List[dict]:
+        """Fetch one ascending page of account history from Etherscan
+        
+        Calls go through the rate-limit scheduler; throttled responses are
+        retried with backoff instead of being read as an empty history.
+        """
+        session = await self.get_session()
+        params = {
+            'module': 'account',
+            'action': action,
+            'address': address,
+            'startblock': start_block,
+            'endblock': end_block,
+            'page': page_number,
+            'offset': page_size,
+            'sort': 'asc',
+            'apikey': self.etherscan_api
+        }
+        
+        breaker = self.breakers['etherscan']
+        
+        for attempt in range(ETHERSCAN_MAX_RETRIES + 1):
+            breaker.check()  # don't queue for a token while Etherscan is down
+            with timed_stage('etherscan_queue'):
+                await self.etherscan_scheduler.acquire(priority)
+            with breaker.guard():
+                with timed_stage('etherscan'):
+                    async with session.get(ETHERSCAN_API_URL, params=params) as response:
+                        data = await response.json(content_type=None)
+                if self.is_upstream_error(data):
+                    raise EtherscanError(f"{data.get('message')}: {data.get('result')}")
+            
+            # Etherscan answered; throttling is our quota, not an outage, so it isn't a breaker failure
+            if self.is_rate_limited(data):
+                error = EtherscanThrottled(str(data.get('result')))
+                record_error('etherscan', error)
+                if attempt == ETHERSCAN_MAX_RETRIES:
+                    raise error
+                await asyncio.sleep(min(8.0, 0.5 * 2 ** attempt))
+                continue
             
             if data['status'] == '1':
                 return data['result']
-            return []
-        except:
-            return []
+            if isinstance(data.get('result'), list):
+                return []  # "No transactions found"
+            # Only address errors are left; asking again won't help
+            raise EtherscanAddressError(f"{data.get('message')}: {data.get('result')}")
+    
+    @staticmethod
+    def error_text(data: dict) -> Optional[str]:
+        """Lower-cased error of a status-0 reply, None for results"""
+        if data.get('status') == '1' or isinstance(data.get('result'), list):
+            return None
+        return str(data.get('result')).lower()
+    
+    @classmethod
+    def is_rate_limited(cls, data: dict) -> bool:
+        """Etherscan answers rate limits with status 0 and a string result"""
+        text = cls.error_text(data)
+        return text is not None and ('rate limit' in text or 'too many' in text or 'busy' in text)
+    
+    @classmethod
+    def is_upstream_error(cls, data: dict) -> bool:
+        """Errors not caused by the address or our rate, e.g. an invalid API key or a query timeout"""
+        text = cls.error_text(data)
+        return text is not None and not cls.is_rate_limited(data) and 'address' not in text
     
-    def calculate_transaction_score(self, tx_count: int, transactions: List[dict]) -> int:
+    def calculate_transaction_score(self, tx_count: int, transactions: TransactionStats) -> int:
         """Score based on transaction activity (0-100)"""
         
         if tx_count == 0:
@@ -189,34 +1876,15 @@ class WalletAnalyzer:
             score = 95
         
         # Bonus for consistent activity
-        if len(transactions) > 0:
-            try:
-                timestamps = [int(tx['timeStamp']) for tx in transactions[:20]]
-                if len(timestamps) > 1:
-                    time_span_days = (max(timestamps) - min(timestamps)) / 86400
-                    if time_span_days > 180:
-                        score += 5
-            except:
-                pass
+        if transactions.count > 1 and transactions.time_span_days > 180:
+            score += 5
         
         return min(100, score)
     
-    def calculate_defi_score(self, transactions: List[dict]) -> int:
+    def calculate_defi_score(self, transactions: TransactionStats) -> int:
         """Score based on DeFi interactions (0-100)"""
         
-        defi_protocols = [
-            '0x7a250d5630b4cf539739df2c5dacb4c659f2488d',  # Uniswap V2
-            '0xe592427a0aece92de3edee1f18e0157c05861564',  # Uniswap V3
-            '0x68b3465833fb72a70ecdf485e0e4c7bd8665fc45',  # Uniswap Universal Router
-            '0x1111111254eeb25477b68fb85ed929f73a960582',  # 1inch
-            '0xdef1c0ded9bec7f1a1670819833240f027b25eff',  # 0x Protocol
-        ]
-        
-        defi_interactions = 0
-        for tx in transactions[:50]:
-            to_address = tx.get('to', '').lower()
-            if to_address in [addr.lower() for addr in defi_protocols]:
-                defi_interactions += 1
+        defi_interactions = transactions.defi_interactions
         
         if defi_interactions == 0:
             return 0
@@ -229,28 +1897,30 @@ class WalletAnalyzer:
         else:
             return 90
     
-    def calculate_security_score(self, address: str, transactions: List[dict]) -> int:
+    def calculate_security_score(self, address: str, transactions: TransactionStats) -> int:
         """Score based on security indicators (0-100)"""
         
         score = 50  # Start neutral
         
-        if len(transactions) > 0:
-            # Penalty for failed transactions
-            failed_txs = sum(1 for tx in transactions if tx.get('isError') == '1')
-            if failed_txs > 5:
+        if transactions.count > 0:
+            # Penalty for failed transactions (5% tolerance on long histories)
+            failed_txs = transactions.failed
+            if failed_txs > max(5, transactions.count * 0.05):
                 score -= 10
             
             # Bonus for successful transactions
-            if failed_txs == 0 and len(transactions) > 10:
+            if failed_txs == 0 and transactions.count > 10:
                 score += 20
             
             # Check gas usage patterns
-            try:
-                avg_gas = sum(int(tx.get('gasUsed', 0)) for tx in transactions[:20]) / min(20, len(transactions))
-                if avg_gas < 100000:
-                    score += 15
-            except:
-                pass
+            if transactions.avg_gas_used < 100000:
+                score += 15
+            
+            # Penalty for risky counterparties
+            if transactions.mixer_interactions > 0:
+                score -= 20
+            if transactions.scam_interactions > 0:
+                score -= 25
         
         return min(100, max(0, score))
     
@@ -259,59 +1929,28 @@ class WalletAnalyzer:
         return 40  # Moderate default
     
     def apply_metta_reasoning(self, base_score: float, balance: float, 
-                             tx_count: int, transactions: List[dict]) -> dict:
+                             tx_count: int, transactions: TransactionStats) -> dict:
         """Apply MeTTa-style symbolic reasoning rules"""
-        
-        adjustments = 0
-        rules_applied = []
-        explanations = []
-        
-        # Rule 1: High Balance Bonus
-        if balance > 1.0:
-            adjustments += 5
-            rules_applied.append("HIGH_BALANCE_TRUST")
-            explanations.append(f"Wallet holds {balance:.2f} ETH, indicating financial commitment")
-        elif balance > 0.1:
-            adjustments += 2
-            rules_applied.append("MODERATE_BALANCE")
-            explanations.append(f"Wallet has active balance of {balance:.2f} ETH")
-        
-        # Rule 2: Long-term Activity
-        if tx_count > 100:
-            adjustments += 3
-            rules_applied.append("VETERAN_USER")
-            explanations.append(f"Extensive history with {tx_count} transactions shows long-term engagement")
-        
-        # Rule 3: Consistent Activity Pattern
-        if len(transactions) > 20:
-            try:
-                timestamps = [int(tx['timeStamp']) for tx in transactions[:20]]
-                time_span = (max(timestamps) - min(timestamps)) / 86400
-                if time_span > 365:
-                    adjustments += 4
-                    rules_applied.append("LONG_TERM_HOLDER")
-                    explanations.append("Active for over 1 year, demonstrating stability")
-            except:
-                pass
-        
-        # Rule 4: Low Activity Penalty
-        if tx_count < 5:
-            adjustments -= 3
-            rules_applied.append("NEW_WALLET_DISCOUNT")
-            explanations.append("Limited transaction history reduces confidence")
-        
-        # Rule 5: Zero Balance Warning
-        if balance == 0 and tx_count < 10:
-            adjustments -= 5
-            rules_applied.append("INACTIVE_WALLET")
-            explanations.append("Wallet appears inactive with no balance")
-        
-        explanation = " ".join(explanations) if explanations else "Standard reputation analysis applied"
-        
+        features = self.build_rule_features(base_score, balance, tx_count, transactions)
+        return self.rule_engine.evaluate(features)
+    
+    def build_rule_features(self, base_score: float, balance: float,
+                            tx_count: int, transactions: TransactionStats) -> dict:
+        """Precompute every feature the reasoning rules may reference"""
         return {
-            'adjustments': int(adjustments),
-            'rules_applied': rules_applied,
-            'explanation': explanation
+            'base_score': base_score,
+            'balance': balance,
+            'tx_count': tx_count,
+            'history_count': transactions.count,
+            'failed_count': transactions.failed,
+            'avg_gas_used': transactions.avg_gas_used,
+            'defi_interactions': transactions.defi_interactions,
+            'cex_interactions': transactions.cex_interactions,
+            'bridge_interactions': transactions.bridge_interactions,
+            'mixer_interactions': transactions.mixer_interactions,
+            'scam_interactions': transactions.scam_interactions,
+            'time_span_days': transactions.time_span_days,
+            'wallet_age_days': self.estimate_wallet_age(transactions)
         }
     
     def get_reputation_level(self, score: int) -> str:
@@ -329,16 +1968,12 @@ class WalletAnalyzer:
         else:
             return "Developing"
     
-    def estimate_wallet_age(self, transactions: List[dict]) -> int:
+    def estimate_wallet_age(self, transactions: TransactionStats) -> int:
         """Estimate wallet age in days"""
-        if not transactions:
-            return 0
-        try:
-            oldest_tx = min(int(tx['timeStamp']) for tx in transactions)
-            age_seconds = time.time() - oldest_tx
-            return int(age_seconds / 86400)
-        except:
+        if transactions.first_timestamp is None:
             return 0
+        age_seconds = time.time() - transactions.first_timestamp
+        return int(age_seconds / 86400)
     
     def get_default_analysis(self, wallet_address: str) -> dict:
         """Return default scores when analysis fails"""
@@ -365,22 +2000,115 @@ class WalletAnalyzer:
 # ============================================
 
 analyzer = WalletAnalyzer()
+REGISTRY.register(AnalyzerCollector(analyzer))
 analyzer_protocol = Protocol("WalletAnalysis")
 
+analysis_tasks = set()
+
 @analyzer_protocol.on_message(model=ScoreRequest)
 async def handle_score_request(ctx: Context, sender: str, msg: ScoreRequest):
-    """Receive analysis request and perform analysis"""
+    """Receive analysis request and schedule analysis"""
     
     ctx.logger.info(f"📥 Received analysis request: {msg.wallet_address}")
     ctx.logger.info(f"   Request ID: {msg.request_id}")
     
-    # Perform analysis
-    analysis_result = await analyzer.analyze_wallet(ctx, msg.wallet_address)
+    # Run in the background so one slow upstream doesn't block the message queue
+    deadline = time.monotonic() + ANALYSIS_DEADLINE_SECONDS
+    task = asyncio.create_task(process_score_request(ctx, msg, deadline))
+    analysis_tasks.add(task)
+    task.add_done_callback(analysis_tasks.discard)
+
+async def process_score_request(ctx: Context, msg: ScoreRequest, deadline: float):
+    """Perform analysis and send result to orchestrator"""
+    
+    analysis_result = await analyzer.analyze_wallet(ctx, msg.wallet_address, deadline=deadline)
+    
+    response = build_score_analysis(msg.request_id, msg.wallet_address, analysis_result)
+    
+    # Send to orchestrator
+    if ORCHESTRATOR_ADDRESS:
+        await ctx.send(ORCHESTRATOR_ADDRESS, response)
+        ctx.logger.info(f"✅ Analysis sent to orchestrator")
+        ctx.logger.info(f"   Final Score: {response.score}/100")
+        ctx.logger.info(f"   Level: {response.reputation_level}")
+    else:
+        ctx.logger.error("❌ No orchestrator address configured!")
+
+@analyzer_protocol.on_message(model=BatchScoreRequest)
+async def handle_batch_score_request(ctx: Context, sender: str, msg: BatchScoreRequest):
+    """Receive batch analysis request and schedule analysis"""
+    
+    ctx.logger.info(f"📥 Received batch request: {len(msg.wallet_addresses)} wallets")
+    ctx.logger.info(f"   Request ID: {msg.request_id}")
+    
+    deadline = time.monotonic() + BATCH_ANALYSIS_DEADLINE_SECONDS
+    task = asyncio.create_task(process_batch_score_request(ctx, sender, msg, PRIORITY_BULK, deadline))
+    analysis_tasks.add(task)
+    task.add_done_callback(analysis_tasks.discard)
+
+@analyzer_protocol.on_message(model=PrescoreRequest)
+async def handle_prescore_request(ctx: Context, sender: str, msg: PrescoreRequest):
+    """Receive wallets to score ahead of time, behind all user-facing work"""
+    
+    ctx.logger.info(f"🔥 Received prescore request: {len(msg.wallet_addresses)} wallets")
+    
+    deadline = time.monotonic() + BATCH_ANALYSIS_DEADLINE_SECONDS
+    task = asyncio.create_task(process_batch_score_request(ctx, sender, msg, PRIORITY_BACKGROUND, deadline))
+    analysis_tasks.add(task)
+    task.add_done_callback(analysis_tasks.discard)
+
+async def process_batch_score_request(ctx: Context, sender: str, msg: BatchScoreRequest,
+                                      priority: int = PRIORITY_BULK, deadline: Optional[float] = None):
+    """Analyze a batch of wallets and reply with all results at once"""
+    
+    wallets = list(dict.fromkeys(msg.wallet_addresses))[:MAX_BATCH_WALLETS]
+    if len(wallets) < len(msg.wallet_addresses):
+        ctx.logger.warning(f"⚠️ Batch reduced to {len(wallets)} unique wallets (max {MAX_BATCH_WALLETS})")
     
-    # Create response
-    response = ScoreAnalysis(
+    valid_wallets = [wallet for wallet in wallets if Web3.is_address(wallet)]
+    
+    # One JSON-RPC batch for every balance and nonce
+    try:
+        wallet_data = await analyzer.get_balances_and_nonces(
+            [Web3.to_checksum_address(wallet) for wallet in valid_wallets]
+        )
+    except Exception as e:
+        ctx.logger.error(f"❌ RPC batch failed: {str(e)}")
+        wallet_data = {}
+    
+    async def analyze(wallet: str) -> ScoreAnalysis:
+        if not Web3.is_address(wallet):
+            return build_score_analysis(msg.request_id, wallet, analyzer.get_default_analysis(wallet))
+        balance, tx_count = wallet_data.get(Web3.to_checksum_address(wallet), (None, None))
+        result = await analyzer.analyze_wallet(
+            ctx, wallet, balance=balance, tx_count=tx_count, priority=priority, deadline=deadline
+        )
+        return build_score_analysis(msg.request_id, wallet, result)
+    
+    results = await asyncio.gather(*(analyze(wallet) for wallet in wallets))
+    
+    await ctx.send(sender, BatchScoreAnalysis(
         request_id=msg.request_id,
-        wallet_address=msg.wallet_address,
+        analyzer_id=analyzer.agent_id,
+        results=results,
+        timestamp=int(time.time())
+    ))
+    ctx.logger.info(f"✅ Batch sent: {len(results)} analyses")
+
+@analyzer_protocol.on_message(model=AnalyzerPing)
+async def handle_ping(ctx: Context, sender: str, msg: AnalyzerPing):
+    """Answer the orchestrator's shard health check"""
+    await ctx.send(sender, AnalyzerStatus(
+        analyzer_id=str(ctx.agent.address),
+        active_analyses=len(analysis_tasks),
+        timestamp=int(time.time())
+    ))
+
+def build_score_analysis(request_id: str, wallet_address: str, analysis_result: dict) -> ScoreAnalysis:
+    """Create ScoreAnalysis message from an analysis result"""
+    return ScoreAnalysis(
+        request_id=request_id,
+        wallet_address=wallet_address,
         score=analysis_result['score'],
         analyzer_id=analyzer.agent_id,
         transaction_score=analysis_result['transaction_score'],
@@ -394,15 +2122,6 @@ async def handle_score_request(ctx: Context, sender: str, msg: ScoreRequest):
         analysis_data=analysis_result['analysis_data'],
         timestamp=int(time.time())
     )
-    
-    # Send to orchestrator
-    if ORCHESTRATOR_ADDRESS:
-        await ctx.send(ORCHESTRATOR_ADDRESS, response)
-        ctx.logger.info(f"✅ Analysis sent to orchestrator")
-        ctx.logger.info(f"   Final Score: {response.score}/100")
-        ctx.logger.info(f"   Level: {response.reputation_level}")
-    else:
-        ctx.logger.error("❌ No orchestrator address configured!")
 
 # ============================================
 # HEALTH CHECK
@@ -412,17 +2131,36 @@ async def handle_score_request(ctx: Context, sender: str, msg: ScoreRequest):
 async def health_check(ctx: Context):
     """Periodic health check"""
     
-    eth_connected = w3.is_connected()
+    try:
+        eth_connected = await analyzer.w3.is_connected()
+    except Exception as e:
+        record_error('rpc', e)
+        eth_connected = False
     has_api_key = bool(ETHERSCAN_API_KEY)
     has_orchestrator = bool(ORCHESTRATOR_ADDRESS)
     
     ctx.logger.info(f"""
 📊 Analyzer Health:
-   ETH RPC: {eth_connected}
+   ETH RPC: {eth_connected} (hedged {analyzer.rpc_pool.hedged})
+   RPC Pool: {analyzer.rpc_pool.stats()}
    Etherscan API: {has_api_key}
    Orchestrator: {has_orchestrator}
+   Active Analyses: {len(analysis_tasks)} ({len(analyzer.in_flight)} wallets, {analyzer.coalesced} coalesced)
+   Cache: {analyzer.cache.stats()} (negative: {analyzer.negative_cache.stats()})
+   Circuits: { {name: breaker.state for name, breaker in analyzer.breakers.items()} }
+   Etherscan Scheduler: {analyzer.etherscan_scheduler.stats()}
+   Analysis Slots: {analyzer.analysis_slots.stats()}
     """)
 
+@agent.on_interval(period=METTA_RULES_RELOAD_INTERVAL)
+async def reload_rules(ctx: Context):
+    """Hot-reload reasoning rules when the rules file changes"""
+    try:
+        if analyzer.rule_engine.reload_if_changed():
+            ctx.logger.info(f"🧠 Reloaded {len(analyzer.rule_engine.rule_ids)} MeTTa rules")
+    except ValueError as e:
+        ctx.logger.error(f"❌ {str(e)}")
+
 # ============================================
 # STARTUP
 # ============================================
@@ -432,7 +2170,20 @@ async def startup(ctx: Context):
     """Startup handler"""
     ctx.logger.info(f"🤖 Wallet Analyzer Started")
     ctx.logger.info(f"   Address: {ctx.agent.address}")
+    ctx.logger.info(f"   RPC Endpoints: {len(ETH_RPC_URLS)}")
     ctx.logger.info(f"   Orchestrator: {ORCHESTRATOR_ADDRESS[:20]}..." if ORCHESTRATOR_ADDRESS else "   Orchestrator: Not configured")
+    
+    if METRICS_PORT:
+        try:
+            start_http_server(METRICS_PORT, addr=METRICS_HOST)
+            ctx.logger.info(f"   Metrics: http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+        except OSError as e:
+            ctx.logger.error(f"❌ Metrics server failed: {str(e)}")
+
+@agent.on_event("shutdown")
+async def shutdown(ctx: Context):
+    """Shutdown handler"""
+    await analyzer.close()
 
 # ============================================
 # INCLUDE PROTOCOLS
@@ -0,0 +1,263 @@
+# WALLET ANALYZER BENCHMARKS - Offline scoring pipeline
+#
+# Runs the analyzer's scoring pipeline on synthetic wallets with the network
+# layer stubbed, and reports throughput and peak memory per benchmark.
+# Benchmarks that walk the history report tx/s; the scoring components work
+# on pre-aggregated stats, so they report time per call instead.
+#
+#   python benchmarks/bench_wallet_analyzer.py --output bench.json
+#   python benchmarks/bench_wallet_analyzer.py --baseline bench.json
+#
+# With --baseline, exits non-zero if any benchmark got slower than
+# --max-regression times its baseline median.
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Keep the transaction store out of the working directory (removed by main)
+BENCH_TMP = tempfile.TemporaryDirectory(prefix="synthia-bench-")
+BENCH_DIR = BENCH_TMP.name
+os.environ.setdefault("TX_STORE_PATH", os.path.join(BENCH_DIR, "transactions.db"))
+os.environ.setdefault("ETHERSCAN_API_KEY", "benchmark")
+os.environ.setdefault("ETHERSCAN_RATE_LIMIT", "1000000")
+os.environ.setdefault("ETHERSCAN_BURST", "1000000")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "agents"))
+
+import wallet_analyzer as wa  # noqa: E402
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+COUNTERPARTIES = sorted(wa.DEFI_PROTOCOLS) + [f"0x{i:040x}" for i in range(1, 200)]
+
+# ============================================
+# SYNTHETIC WALLETS
+# ============================================
+
+def synthetic_transactions(count: int, seed: int = 0):
+    """Yield Etherscan-shaped txlist rows, oldest first"""
+    rng = random.Random(seed)
+    timestamp = 1_500_000_000
+    for i in range(count):
+        timestamp += rng.randint(60, 86400)
+        yield {
+            'blockNumber': str(5_000_000 + i // 3),
+            'timeStamp': str(timestamp),
+            'hash': f"0x{seed:08x}{i:056x}",
+            'from': f"0x{seed:040x}",
+            'to': rng.choice(COUNTERPARTIES),
+            'value': str(rng.randint(0, 10**18)),
+            'gas': '250000',
+            'gasPrice': str(rng.randint(10**9, 10**11)),
+            'isError': '1' if rng.random() < 0.02 else '0',
+            'txreceipt_status': '1',
+            'input': '0x',
+            'gasUsed': str(rng.randint(21000, 300000)),
+            'confirmations': '100',
+        }
+
+def synthetic_pages(count: int, seed: int = 0, page_size: int = wa.ETHERSCAN_PAGE_SIZE):
+    """Yield synthetic history in pages, like the Etherscan ingestion path"""
+    page = []
+    for tx in synthetic_transactions(count, seed):
+        page.append(tx)
+        if len(page) == page_size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+def synthetic_stats(count: int, seed: int = 0) -> wa.TransactionStats:
+    stats = wa.TransactionStats()
+    for page in synthetic_pages(count, seed):
+        stats.add_page(page)
+    return stats
+
+class StubbedAnalyzer(wa.WalletAnalyzer):
+    """WalletAnalyzer with RPC and Etherscan replaced by synthetic data"""
+    
+    def __init__(self, history_size: int, seed: int):
+        super().__init__()
+        self.history_size = history_size
+        self.seed = seed
+    
+    async def get_session(self):
+        return None
+    
+    async def get_eth_balance(self, address: str) -> float:
+        return 1.5
+    
+    async def get_transaction_count(self, address: str) -> int:
+        return self.history_size
+    
+    async def iter_etherscan_pages(self, address, action='txlist', start_block=0, **kwargs):
+        if start_block > 0:
+            return  # already synced
+        for page in synthetic_pages(self.history_size, self.seed):
+            yield page
+
+# ============================================
+# BENCHMARKS
+# ============================================
+
+class Context:
+    logger = logging.getLogger("bench")
+
+def bench_ingest(size: int):
+    """Parse + aggregate a wallet's history page by page"""
+    pages = list(synthetic_pages(size))
+    def run():
+        stats = wa.TransactionStats()
+        for page in pages:
+            stats.add_page(page)
+    return run
+
+def bench_component(method: str):
+    """One scoring call on stats aggregated outside the timed region"""
+    def factory(size: int):
+        analyzer = wa.WalletAnalyzer()
+        stats = synthetic_stats(size)
+        calls = {
+            'calculate_transaction_score': lambda: analyzer.calculate_transaction_score(size, stats),
+            'calculate_defi_score': lambda: analyzer.calculate_defi_score(stats),
+            'calculate_security_score': lambda: analyzer.calculate_security_score("0x0", stats),
+            'apply_metta_reasoning': lambda: analyzer.apply_metta_reasoning(55.0, 1.5, size, stats),
+        }
+        return calls[method]
+    return factory
+
+def bench_analyze_wallet(size: int):
+    """End-to-end analyze_wallet on a cold wallet (sync to store + score)"""
+    counter = iter(range(1_000_000))
+    def run():
+        seed = next(counter)
+        analyzer = StubbedAnalyzer(size, seed)
+        db_path = os.path.join(BENCH_DIR, f"analyze-{size}-{seed}.db")
+        analyzer.tx_store = wa.TransactionStore(db_path)
+        address = f"0x{seed + 1:040x}"
+        asyncio.run(analyzer.analyze_wallet(Context(), address))
+        analyzer.tx_store.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+    return run
+
+BENCHMARKS = {
+    'ingest_history': bench_ingest,
+    'calculate_transaction_score': bench_component('calculate_transaction_score'),
+    'calculate_defi_score': bench_component('calculate_defi_score'),
+    'calculate_security_score': bench_component('calculate_security_score'),
+    'apply_metta_reasoning': bench_component('apply_metta_reasoning'),
+    'analyze_wallet': bench_analyze_wallet,
+}
+
+# Benchmarks whose cost grows with the history; the rest are O(1) per call
+PER_TX_BENCHMARKS = {'ingest_history', 'analyze_wallet'}
+
+# ============================================
+# RUNNER
+# ============================================
+
+def measure(run, repeat: int, min_time: float) -> dict:
+    """Median wall time over repeats, then peak traced memory of one run"""
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < repeat or (time.perf_counter() - started < min_time and len(timings) < 1000):
+        t0 = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - t0)
+    
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    return {
+        'runs': len(timings),
+        'median_s': statistics.median(timings),
+        'min_s': min(timings),
+        'peak_mb': round(peak / 2**20, 3)
+    }
+
+def run_benchmarks(names, sizes, repeat: int, min_time: float) -> list:
+    results = []
+    for name in names:
+        for size in sizes:
+            run = BENCHMARKS[name](size)
+            timing = measure(run, repeat, min_time)
+            result = {'benchmark': name, 'size': size, **timing}
+            if name in PER_TX_BENCHMARKS:
+                result['tx_per_s'] = round(size / timing['median_s']) if timing['median_s'] else None
+                print(f"{name:<30} {size:>9} txs  {timing['median_s'] * 1000:>10.3f} ms  "
+                      f"{result['tx_per_s'] or 0:>12} tx/s  {timing['peak_mb']:>9.2f} MB")
+            else:
+                result['us_per_call'] = round(timing['median_s'] * 1e6, 3)
+                print(f"{name:<30} {size:>9} txs  {result['us_per_call']:>10.3f} us  "
+                      f"{'per call':>17}  {timing['peak_mb']:>9.2f} MB")
+            results.append(result)
+    return results
+
+def compare(results: list, baseline_path: str, max_regression: float) -> list:
+    """Benchmarks whose median exceeds max_regression x the baseline median"""
+    with open(baseline_path) as f:
+        baseline = {(r['benchmark'], r['size']): r for r in json.load(f)['results']}
+    regressions = []
+    for result in results:
+        base = baseline.get((result['benchmark'], result['size']))
+        if base and result['median_s'] > base['median_s'] * max_regression:
+            regressions.append({
+                'benchmark': result['benchmark'],
+                'size': result['size'],
+                'ratio': round(result['median_s'] / base['median_s'], 2)
+            })
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Wallet analyzer scoring benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="synthetic wallet sizes in transactions (e.g. 10 1000 1000000)")
+    parser.add_argument("--bench", nargs="+", choices=sorted(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per benchmark")
+    parser.add_argument("--output", help="write JSON report here")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    parser.add_argument("--max-regression", type=float, default=1.25)
+    args = parser.parse_args()
+    
+    logging.getLogger("bench").setLevel(logging.WARNING)
+    
+    try:
+        results = run_benchmarks(args.bench, args.sizes, args.repeat, args.min_time)
+    finally:
+        wa.analyzer.tx_store.close()
+        BENCH_TMP.cleanup()
+    report = {
+        'created_at': int(time.time()),
+        'python': sys.version.split()[0],
+        'results': results
+    }
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.output}")
+    
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.max_regression)
+        for regression in regressions:
+            print(f"❌ Regression: {regression['benchmark']} @ {regression['size']} txs "
+                  f"is {regression['ratio']}x baseline")
+        if regressions:
+            sys.exit(1)
+        print("✅ No regressions against baseline")
+
+if __name__ == "__main__":
+    main()